@@ -5,18 +5,22 @@ Syncs data from scanners and calculates fluxes for an OpenSO2 network
 import os
 import sys
 import yaml
+import queue
 import logging
 import traceback
 import numpy as np
-import xarray as xr
 import pandas as pd
 import pyqtgraph as pg
 from datetime import datetime
 from functools import partial
 from collections import OrderedDict
-from logging.handlers import RotatingFileHandler
+from logging.handlers import (
+    RotatingFileHandler, QueueHandler, QueueListener
+)
 from PyQt5.QtGui import QPalette, QColor, QFont, QIcon
-from PyQt5.QtCore import Qt, QThreadPool, QTimer, pyqtSlot, QThread
+from PyQt5.QtCore import (
+    Qt, QTimer, pyqtSlot, pyqtSignal, QThread
+)
 from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QApplication, QGridLayout, QMessageBox, QLabel,
     QLineEdit, QPushButton, QFrame, QSplitter, QTabWidget, QFileDialog,
@@ -26,9 +30,11 @@ from PyQt5.QtWidgets import (
 
 from openso2.station import Station
 from openso2.gui_funcs import (
-    SyncWorker, PostAnalysisWorker, Widgets, QTextEditLogger, browse
+    SyncWorker, PostAnalysisWorker, Widgets, QTextEditLogger, LogFormatter,
+    browse
 )
 from openso2.plume import calc_end_point
+from openso2.analyse_scan import read_scan_so2
 
 __version__ = '1.3'
 __author__ = 'Ben Esse'
@@ -42,16 +48,36 @@ if not os.path.isdir('bin/'):
 fh = RotatingFileHandler('bin/OpenSO2.log', maxBytes=20000, backupCount=5)
 fh.setLevel(logging.INFO)
 fmt = '%(asctime)s %(levelname)s %(module)s %(funcName)s %(message)s'
-fh.setFormatter(logging.Formatter(fmt))
-logger.addHandler(fh)
+fh.setFormatter(LogFormatter(fmt))
+
+# Write the log file from a background thread to avoid blocking the GUI
+log_queue = queue.Queue(-1)
+logger.addHandler(QueueHandler(log_queue))
+log_listener = QueueListener(log_queue, fh, respect_handler_level=True)
+log_listener.start()
 
 COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#9467bd', '#8c564b',
           '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
 
+# Maximum number of lines to keep in the log text boxes
+MAX_LOG_LINES = 2000
+
+# Number of colour levels used in the SO2 map plots
+MAP_COLOR_LEVELS = 256
+
+# Start of UNIX time, used to convert times for the plot axes
+UNIX_EPOCH = np.datetime64(0, 's')
+
+# Maximum number of scans to show (and keep loaded) in the SO2 map plots
+MAX_MAP_SCANS = 1000
+
 
 class MainWindow(QMainWindow):
     """View for the OpenSO2 GUI."""
 
+    # Define signals
+    startSync = pyqtSignal()
+
     def __init__(self):
         """View initialiser."""
         super().__init__()
@@ -73,11 +99,9 @@ class MainWindow(QMainWindow):
         self._centralWidget.setWidgetResizable(True)
         self._centralWidget.setWidget(self.widget)
 
-        # Generate the threadpool for launching background processes
-        self.threadpool = QThreadPool()
-
-        # Setup widget stylesheets
-        QTabWidget().setStyleSheet('QTabWidget { font-size: 18pt; }')
+        # Create the fonts shared between widgets
+        self.header_font = QFont('Ariel', 12)
+        self.log_font = QFont('Courier', 10)
 
         # Create an empty dictionary to hold the GUI widgets
         self.widgets = Widgets()
@@ -88,6 +112,38 @@ class MainWindow(QMainWindow):
         # Initialise an empty dictionary to hold the station information
         self.stations = {}
 
+        # Create a timer to redraw the scan plots that have new data, so
+        #  that bursts of updates are drawn together
+        self.dirty_scan_plots = {}
+        self.scanPlotTimer = QTimer(self)
+        self.scanPlotTimer.setSingleShot(True)
+        self.scanPlotTimer.setInterval(200)
+        self.scanPlotTimer.timeout.connect(self._redraw_scan_plots)
+
+        # Create the sync timer once, it is started and stopped by the sync
+        #  button
+        self.syncTimer = QTimer(self)
+        self.syncTimer.timeout.connect(self._station_sync)
+
+        # Create a long-lived thread and worker for the station syncing
+        self.syncThread = QThread()
+        self.syncWorker = SyncWorker()
+        self.syncWorker.moveToThread(self.syncThread)
+        self.sync_busy = False
+        self.sync_cycle = 0
+        self.close_confirmed = False
+
+        # Connect the signals
+        self.startSync.connect(self.syncWorker.run)
+        self.syncWorker.finished.connect(self.sync_finished)
+        self.syncWorker.error.connect(self.update_error)
+        self.syncWorker.updateLog.connect(self.update_station_log)
+        self.syncWorker.updateStationStatus.connect(self.update_stat_status)
+        self.syncWorker.updateGuiStatus.connect(self.update_gui_status)
+        self.syncWorker.updatePlots.connect(self.queue_scan_plot)
+        self.syncWorker.updateFluxPlot.connect(self.update_flux_plots)
+        self.syncThread.start()
+
         # Build the GUI
         self._createApp()
 
@@ -208,7 +264,7 @@ class MainWindow(QMainWindow):
 
         header = QLabel('Volcano')
         header.setAlignment(Qt.AlignLeft)
-        header.setFont(QFont('Ariel', 12))
+        header.setFont(self.header_font)
         volc_layout.addWidget(header, nrow, 0, 1, 2)
         nrow += 1
 
@@ -231,7 +287,7 @@ class MainWindow(QMainWindow):
 
         header = QLabel('Default Plume Settings')
         header.setAlignment(Qt.AlignLeft)
-        header.setFont(QFont('Ariel', 12))
+        header.setFont(self.header_font)
         volc_layout.addWidget(header, nrow, 0, 1, 2)
         nrow += 1
 
@@ -332,7 +388,7 @@ class MainWindow(QMainWindow):
 
         header = QLabel('Analysed Scan Files')
         header.setAlignment(Qt.AlignLeft)
-        header.setFont(QFont('Ariel', 12))
+        header.setFont(self.header_font)
         sync_layout.addWidget(header, nrow, 0, 1, 3)
         nrow += 1
 
@@ -352,7 +408,7 @@ class MainWindow(QMainWindow):
 
         header = QLabel('Spectra Files')
         header.setAlignment(Qt.AlignLeft)
-        header.setFont(QFont('Ariel', 12))
+        header.setFont(self.header_font)
         sync_layout.addWidget(header, nrow, 0, 1, 3)
         nrow += 1
 
@@ -377,6 +433,13 @@ class MainWindow(QMainWindow):
         sync_layout.addWidget(self.widgets['sync_interval'], nrow, 1)
         nrow += 1
 
+        sync_layout.addWidget(QLabel('Plot Interval\n(cycles):'), nrow, 0)
+        self.widgets['plot_every'] = QSpinBox()
+        self.widgets['plot_every'].setRange(1, 100)
+        self.widgets['plot_every'].setValue(1)
+        sync_layout.addWidget(self.widgets['plot_every'], nrow, 1)
+        nrow += 1
+
         sync_layout.setRowStretch(nrow, 10)
 
         # Post Analysis =======================================================
@@ -423,9 +486,9 @@ class MainWindow(QMainWindow):
 
         # Create a textbox to display the program logs
         self.logBox = QTextEditLogger(self)
-        fmt = logging.Formatter('%(asctime)s - %(message)s',
-                                '%Y-%m-%d %H:%M:%S')
+        fmt = LogFormatter('%(asctime)s - %(message)s', '%Y-%m-%d %H:%M:%S')
         self.logBox.setFormatter(fmt)
+        self.logBox.widget.setMaximumBlockCount(MAX_LOG_LINES)
         logger.addHandler(self.logBox)
         logger.setLevel(logging.INFO)
         layout.addWidget(self.logBox.widget, 3, 0, 1, 6)
@@ -449,7 +512,7 @@ class MainWindow(QMainWindow):
         # Add plots for overall results
         # Create the graphs
         graph_layout = QGridLayout(resultsTab)
-        self.flux_graphwin = pg.GraphicsLayoutWidget(show=True)
+        self.flux_graphwin = pg.GraphicsLayoutWidget()
         pg.setConfigOptions(antialias=True)
 
         # Make the graphs
@@ -470,6 +533,10 @@ class MainWindow(QMainWindow):
             # ax.showGrid(x=True, y=True)
             ax.setLabel('bottom', 'Time')
 
+        # Link the time axes so they only need to be scaled once
+        ax1.setXLink(ax0)
+        ax2.setXLink(ax0)
+
         # Add axis labels
         ax0.setLabel('left', 'SO2 Flux [kg/s]')
         ax1.setLabel('left', 'Plume Altitude [m]')
@@ -484,7 +551,7 @@ class MainWindow(QMainWindow):
 
         # Create the map axes
         map_layout = QGridLayout(mapTab)
-        self.map_graphwin = pg.GraphicsLayoutWidget(show=True)
+        self.map_graphwin = pg.GraphicsLayoutWidget()
         self.map_ax = self.map_graphwin.addPlot(row=0, col=0)
         self.map_ax.setAspectLocked()
         self.map_ax.setDownsampling(mode='peak')
@@ -520,15 +587,32 @@ class MainWindow(QMainWindow):
         # Generate the colormap to use
         self.cmap = pg.colormap.get('viridis')
 
+        # Build lookup tables of the pens and brushes for the SO2 maps
+        self.map_pens = np.empty(MAP_COLOR_LEVELS, dtype=object)
+        self.map_brushes = np.empty(MAP_COLOR_LEVELS, dtype=object)
+        for i, val in enumerate(np.linspace(0, 1, MAP_COLOR_LEVELS)):
+            self.map_pens[i] = pg.mkPen(color=self.cmap.map(val))
+            self.map_brushes[i] = pg.mkBrush(color=self.cmap.map(val))
+
         # Initialise dictionaries to hold the station widgets
         self.station_log = {}
+        self.station_log_len = {}
         self.station_so2_map = {}
         self.station_so2_data = {}
         self.station_cbar = {}
         self.station_axes = {}
+        self.station_scan_lines = {}
+        self.station_legends = {}
         self.station_status = {}
         self.station_graphwin = {}
+        self.station_splitters = {}
+        self.stale_scan_plots = {}
+        self.station_scan_cache = {}
+        self.stale_flux_mode = None
+        self.stale_flux_results = {}
         self.flux_lines = {}
+        self.flux_file_stamps = {}
+        self.flux_time_ranges = {}
         self.station_widgets = {}
 
         # Add station tabs
@@ -536,6 +620,7 @@ class MainWindow(QMainWindow):
         for station in self.stations.values():
             self.add_station(station)
         layout.addWidget(self.stationTabHolder, 0, 0, 1, 10)
+        self.stationTabHolder.currentChanged.connect(self._on_tab_changed)
 
         # Add a button to control syncing
         self.sync_button = QPushButton('Syncing OFF')
@@ -627,10 +712,7 @@ class MainWindow(QMainWindow):
         filter_spectra_cb.setChecked(filter_spectra_flag)
         layout.addWidget(filter_spectra_cb, 1, coln)
         filter_spectra_cb.stateChanged.connect(
-            lambda: self.update_scan_plot(
-                name,
-                f'{self.widgets.get("sync_folder")}/{datetime.now().date()}'
-            )
+            partial(self._refresh_scan_plot, name)
         )
 
         layout.addWidget(QVLine(), 0, coln+1, 2, 1)
@@ -638,12 +720,12 @@ class MainWindow(QMainWindow):
 
         # Add button to edit the station
         edit_btn = QPushButton('Edit Station')
-        edit_btn.clicked.connect(lambda: self.edit_station(name))
+        edit_btn.clicked.connect(partial(self.edit_station, name))
         layout.addWidget(edit_btn, 0, coln)
 
         # Add button to delete the station
         close_btn = QPushButton('Delete Station')
-        close_btn.clicked.connect(lambda: self.del_station(name))
+        close_btn.clicked.connect(partial(self.del_station, name))
         layout.addWidget(close_btn, 1, coln)
         coln += 1
 
@@ -655,49 +737,15 @@ class MainWindow(QMainWindow):
             'filter_spectra_flag': filter_spectra_cb
         }
 
-        # Create the graphs
-        self.station_graphwin[name] = pg.GraphicsLayoutWidget(show=True)
-        pg.setConfigOptions(antialias=True)
-
-        # Make the graphs
-        ax0 = self.station_graphwin[name].addPlot(row=0, col=0)
-        x_axis = pg.DateAxisItem(utcOffset=0)
-        ax1 = self.station_graphwin[name].addPlot(row=0, col=1,
-                                                  axisItems={'bottom': x_axis})
-        self.station_axes[name] = [ax0, ax1]
-
-        for ax in self.station_axes[name]:
-            ax.setDownsampling(mode='peak')
-            ax.setClipToView(True)
-            ax.showGrid(x=True, y=True)
-
-        # Add axis labels
-        ax0.setLabel('left', 'SO2 SCD [molec/cm2]')
-        ax1.setLabel('left', 'Scan Angle [deg]')
-        ax0.setLabel('bottom', 'Scan Angle [deg]')
-        ax1.setLabel('bottom', 'Time [UTC]')
-
-        # Initialise the scatter plot
-        so2_map = pg.ScatterPlotItem()
-        ax1.addItem(so2_map)
-        self.station_so2_map[name] = so2_map
-
-        # Initialise the colorbar
-        im = pg.ImageItem()
-        cbar = pg.ColorBarItem(values=(0, 1e18), colorMap=self.cmap)
-        cbar.setImageItem(im)
-        cbar.sigLevelsChangeFinished.connect(
-            lambda: self._update_map_colors(name))
-        self.station_cbar[name] = cbar
-        self.station_graphwin[name].addItem(self.station_cbar[name], 0, 2)
-
         # Create a textbox to hold the station logs
         self.station_log[name] = QPlainTextEdit(self)
         self.station_log[name].setReadOnly(True)
-        self.station_log[name].setFont(QFont('Courier', 10))
+        self.station_log[name].setFont(self.log_font)
+        self.station_log[name].setMaximumBlockCount(MAX_LOG_LINES)
+        self.station_log_len[name] = 0
 
         # Add overview plot lines
-        stat_num = len(self.stations.keys())-1
+        stat_num = len(self.stations)-1
         pen = pg.mkPen(color=COLORS[stat_num], width=2)
         fe0 = pg.ErrorBarItem(pen=pen)
         fl0 = pg.PlotCurveItem(pen=pen)
@@ -708,6 +756,7 @@ class MainWindow(QMainWindow):
         self.flux_axes[1].addItem(fl1)
         self.flux_axes[2].addItem(fl2)
         self.flux_lines[name] = [fe0, fl0, fl1, fl2]
+        self.flux_file_stamps.pop(name, None)
         self.flux_legend.addItem(fl0, name)
 
         # Add station to map plot
@@ -728,18 +777,96 @@ class MainWindow(QMainWindow):
         self.map_plots[name] = [scatter, line1, line2, arrow]
         self.update_station_map(name)
 
-        splitter = QSplitter(Qt.Vertical)
-        splitter.addWidget(self.station_graphwin[name])
-        splitter.addWidget(self.station_log[name])
-        layout.addWidget(splitter, 2, 0, 1, coln)
+        # The graphs are added above the log when the tab is first shown
+        self.station_splitters[name] = QSplitter(Qt.Vertical)
+        self.station_splitters[name].addWidget(self.station_log[name])
+        layout.addWidget(self.station_splitters[name], 2, 0, 1, coln)
 
         logger.info(f'Added {name} station')
 
+    def _build_station_graphs(self, name):
+        """Build the station graphs when its tab is first shown."""
+        # Create the graphs
+        self.station_graphwin[name] = pg.GraphicsLayoutWidget()
+
+        # Make the graphs
+        ax0 = self.station_graphwin[name].addPlot(row=0, col=0)
+        x_axis = pg.DateAxisItem(utcOffset=0)
+        ax1 = self.station_graphwin[name].addPlot(row=0, col=1,
+                                                  axisItems={'bottom': x_axis})
+        self.station_axes[name] = [ax0, ax1]
+
+        for ax in self.station_axes[name]:
+            ax.setDownsampling(mode='peak')
+            ax.setClipToView(True)
+            ax.showGrid(x=True, y=True)
+
+        # Add axis labels
+        ax0.setLabel('left', 'SO2 SCD [molec/cm2]')
+        ax1.setLabel('left', 'Scan Angle [deg]')
+        ax0.setLabel('bottom', 'Scan Angle [deg]')
+        ax1.setLabel('bottom', 'Time [UTC]')
+
+        # Initialise the scan lines, with the latest scan in bold
+        self.station_legends[name] = ax0.addLegend()
+        self.station_scan_lines[name] = []
+        for i in range(5):
+            width = 4 if i == 0 else 2
+            line = pg.PlotCurveItem(pen=pg.mkPen(color=COLORS[i], width=width))
+            ax0.addItem(line)
+            self.station_scan_lines[name].append(line)
+
+        # Initialise the scatter plot
+        so2_map = pg.ScatterPlotItem()
+        ax1.addItem(so2_map)
+        self.station_so2_map[name] = so2_map
+
+        # Initialise the colorbar
+        im = pg.ImageItem()
+        cbar = pg.ColorBarItem(values=(0, 1e18), colorMap=self.cmap)
+        cbar.setImageItem(im)
+        cbar.sigLevelsChangeFinished.connect(
+            partial(self._update_map_colors, name))
+        self.station_cbar[name] = cbar
+        self.station_graphwin[name].addItem(self.station_cbar[name], 0, 2)
+
+        # Match the current theme
+        if self.theme == 'Dark':
+            self._set_station_theme(name, 'k', pg.mkPen('w', width=1.5))
+        else:
+            self._set_station_theme(name, 'w', pg.mkPen('k', width=1.5))
+
+        # Add the graphs above the station log
+        self.station_splitters[name].insertWidget(
+            0, self.station_graphwin[name]
+        )
+
+        # Draw any scans that arrived before the graphs were built
+        if name in self.stale_scan_plots:
+            self.update_scan_plot(name, self.stale_scan_plots.pop(name))
+
+    def _on_tab_changed(self, index):
+        """Build or catch up the graphs on the newly shown tab."""
+        # Catch up the flux plots if they were updated while hidden
+        if index == 0:
+            if self.stale_flux_mode is not None:
+                self._draw_stale_fluxes()
+            return
+
+        tab = self.stationTabHolder.widget(index)
+        for name, station_tab in self.stationTabs.items():
+            if station_tab is tab and name in self.stations:
+                if name not in self.station_graphwin:
+                    self._build_station_graphs(name)
+                elif name in self.stale_scan_plots:
+                    self.update_scan_plot(name,
+                                          self.stale_scan_plots.pop(name))
+                break
+
     def del_station(self, name):
         """Remove a station tab."""
         # Get the index of the station tab
-        station_idx = [i for i, key in enumerate(self.stationTabs.keys())
-                       if name == key][0] + 2
+        station_idx = list(self.stationTabs).index(name) + 2
 
         # Remove the tab from the GUI
         self.stationTabHolder.removeTab(station_idx)
@@ -749,6 +876,9 @@ class MainWindow(QMainWindow):
 
         # Remove the station from the stations dictionary
         self.stations.pop(name)
+        self.station_graphwin.pop(name, None)
+        self.stale_scan_plots.pop(name, None)
+        self.station_scan_cache.pop(name, None)
 
         # Remove the station from the flux legend
         self.flux_legend.removeItem(name)
@@ -840,29 +970,19 @@ class MainWindow(QMainWindow):
             self.widgets['sync_interval'].setDisabled(True)
             self.widgets['sync_interval'].setStyleSheet("color: darkGray")
             self._station_sync()
-            self.syncTimer = QTimer(self)
-            self.syncTimer.setInterval(interval)
-            self.syncTimer.timeout.connect(self._station_sync)
-            self.syncTimer.start()
+            self.syncTimer.start(interval)
 
     def _station_sync(self):
 
-        # If the previous sync thread is still running, wait a cycle
-        try:
-            if self.syncThread.isRunning():
-                return
-        except AttributeError:
-            pass
+        # If the previous sync is still running, wait a cycle
+        if self.sync_busy:
+            return
 
         # Pull the syncing times
-        sync_so2_start = datetime.strptime(
-            self.widgets.get('sync_so2_start'), "%H:%M").time()
-        sync_so2_stop = datetime.strptime(
-            self.widgets.get('sync_so2_stop'), "%H:%M").time()
-        sync_spec_start = datetime.strptime(
-            self.widgets.get('sync_spec_start'), "%H:%M").time()
-        sync_spec_stop = datetime.strptime(
-            self.widgets.get('sync_spec_stop'), "%H:%M").time()
+        sync_so2_start = self.widgets['sync_so2_start'].time().toPyTime()
+        sync_so2_stop = self.widgets['sync_so2_stop'].time().toPyTime()
+        sync_spec_start = self.widgets['sync_spec_start'].time().toPyTime()
+        sync_spec_stop = self.widgets['sync_spec_stop'].time().toPyTime()
 
         # Get the current time
         ts = datetime.now().time()
@@ -884,6 +1004,16 @@ class MainWindow(QMainWindow):
 
         logger.info('Beginning scanner sync')
 
+        # Count the sync cycles, catching up any plots held back by the
+        #  plot interval
+        self.sync_cycle += 1
+        if self._plot_cycle_due():
+            if self.dirty_scan_plots:
+                self.scanPlotTimer.start()
+            if (self.stale_flux_mode is not None
+                    and self.stationTabHolder.currentIndex() == 0):
+                self._draw_stale_fluxes()
+
         # Pull the results folder
         res_dir = self.widgets.get('sync_folder')
         if not os.path.isdir(res_dir):
@@ -915,29 +1045,15 @@ class MainWindow(QMainWindow):
 
         self.statusBar().showMessage('Syncing...')
 
-        # Initialise the sync thread
-        self.syncThread = QThread()
-        self.syncWorker = SyncWorker(
+        # Pass the settings to the sync worker
+        self.syncWorker.set_settings(
             res_dir, self.stations, self.analysis_date, sync_mode, volc_loc,
             default_alt, default_az, wind_speed, scan_pair_time,
             scan_pair_flag, min_scd, max_scd, min_int, max_int)
 
-        # Move the worker to the thread
-        self.syncWorker.moveToThread(self.syncThread)
-
-        # Connect the signals
-        self.syncThread.started.connect(self.syncWorker.run)
-        self.syncWorker.finished.connect(self.sync_finished)
-        self.syncWorker.error.connect(self.update_error)
-        self.syncWorker.updateLog.connect(self.update_station_log)
-        self.syncWorker.updateStationStatus.connect(self.update_stat_status)
-        self.syncWorker.updateGuiStatus.connect(self.update_gui_status)
-        self.syncWorker.updatePlots.connect(self.update_scan_plot)
-        self.syncWorker.updateFluxPlot.connect(self.update_flux_plots)
-        self.syncWorker.finished.connect(self.syncThread.quit)
-
-        # Start the flag
-        self.syncThread.start()
+        # Start the sync on the worker thread
+        self.sync_busy = True
+        self.startSync.emit()
 
 # =============================================================================
 # Flux Post Analysis
@@ -992,12 +1108,42 @@ class MainWindow(QMainWindow):
         self.postWorker.error.connect(self.update_error)
         self.postWorker.updateGuiStatus.connect(self.update_gui_status)
         self.postWorker.updateFluxPlot.connect(self.update_flux_plots)
-        self.postWorker.updatePlots.connect(self.update_scan_plot)
+        self.postWorker.updatePlots.connect(self.queue_scan_plot)
         self.postWorker.finished.connect(self.postThread.quit)
 
         # Start the flag
         self.postThread.start()
 
+    def closeEvent(self, event):
+        """Confirm closing while syncing, then stop the sync thread."""
+        # Ask before closing if syncing is on. The dialog is window modal
+        #  and does not block the event loop, so syncing continues until
+        #  the close is confirmed
+        if self.syncing and not self.close_confirmed:
+            event.ignore()
+            msg = QMessageBox(self)
+            msg.setIcon(QMessageBox.Question)
+            msg.setText('Syncing is active. Are you sure you want to quit?')
+            msg.setWindowTitle('Quit')
+            msg.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+            msg.setDefaultButton(QMessageBox.No)
+            msg.finished.connect(self._confirm_close)
+            msg.open()
+            return
+
+        # Stop syncing and close the sync thread
+        self.syncTimer.stop()
+        self.syncThread.quit()
+        self.syncThread.wait()
+        self.syncWorker.shutdown()
+        event.accept()
+
+    def _confirm_close(self, result):
+        """Close the window if the user confirmed."""
+        if result == QMessageBox.Yes:
+            self.close_confirmed = True
+            self.close()
+
 # =============================================================================
 #   Gui Slots
 # =============================================================================
@@ -1009,6 +1155,7 @@ class MainWindow(QMainWindow):
 
     def sync_finished(self):
         """Signal end of sync."""
+        self.sync_busy = False
         logger.info('Sync complete')
 
     def post_finished(self):
@@ -1024,12 +1171,56 @@ class MainWindow(QMainWindow):
 
     def update_station_log(self, station, log_text):
         """Slot to update the station logs."""
-        text = self.station_log[station].toPlainText().split('\n')
-        for line in log_text[len(text):]:
-            self.station_log[station].appendPlainText(line.strip())
+        # Only add the lines that have not already been displayed. These
+        # are counted separately as old lines are trimmed from the widget
+        nlines = self.station_log_len[station]
+        if len(log_text) > nlines:
+            new_text = ''.join(log_text[nlines:]).rstrip()
+            self.station_log[station].appendPlainText(new_text)
+        self.station_log_len[station] = len(log_text)
+
+    def _refresh_scan_plot(self, name):
+        """Redraw a station scan plot from today's results."""
+        fpath = f'{self.widgets.get("sync_folder")}/{datetime.now().date()}'
+        self.update_scan_plot(name, fpath)
+
+    def queue_scan_plot(self, name, fpath):
+        """Slot to mark a station scan plot as needing a redraw."""
+        self.dirty_scan_plots[name] = fpath
+        if not self.scanPlotTimer.isActive():
+            self.scanPlotTimer.start()
+
+    def _draw_stale_fluxes(self):
+        """Draw the flux updates held back while the plots were hidden."""
+        mode, self.stale_flux_mode = self.stale_flux_mode, None
+        flux_results, self.stale_flux_results = self.stale_flux_results, {}
+        self.update_flux_plots(mode, flux_results)
+
+    def _plot_cycle_due(self):
+        """Check if the plots should be redrawn on this sync cycle."""
+        plot_every = self.widgets.get('plot_every')
+        return not self.syncing or self.sync_cycle % plot_every == 0
+
+    def _redraw_scan_plots(self):
+        """Redraw all scan plots marked as needing an update."""
+        # Hold the updates until the next plotting cycle
+        if not self._plot_cycle_due():
+            return
+
+        dirty_plots, self.dirty_scan_plots = self.dirty_scan_plots, {}
+        for name, fpath in dirty_plots.items():
+            if name in self.stations:
+                self.update_scan_plot(name, fpath)
 
     def update_scan_plot(self, name, fpath):
         """Update the plots."""
+        # If the graphs are not built or not visible, draw them when shown
+        tab = self.stationTabHolder.currentWidget()
+        if (name not in self.station_graphwin
+                or tab is not self.stationTabs[name]):
+            self.stale_scan_plots[name] = fpath
+            return
+
         # Get the scans in the directory
         scan_fnames = os.listdir(f'{fpath}/{name}/so2')
 
@@ -1041,122 +1232,72 @@ class MainWindow(QMainWindow):
         if len(scan_fnames) == 0:
             return
 
-        # Clear the axes
-        self.station_axes[name][0].clear()
-
-        # Add a legend
-        legend = self.station_axes[name][0].addLegend()
-        labels = []
-
-        # Read in the last 5 and plot
-        for i, fname in enumerate(scan_fnames[-5:][::-1]):
-
-            # Load the scan file, unpacking the angle and SO2 data
-            with xr.open_dataset(f'{fpath}/{name}/so2/{fname}') as da:
-                scan_df = da.to_dataframe()
-                scan_df['angle'] = da.coords['angle']
-                scan_df['time'] = pd.date_range(
-                    da.attrs['scan_start_time'],
-                    da.attrs['scan_end_time'],
-                    da.attrs['specs_per_scan']
+        # Get the quality control limits
+        lo_scd_lim = float(self.widgets.get('lo_scd_lim'))
+        hi_scd_lim = float(self.widgets.get('hi_scd_lim'))
+        lo_int_lim = float(self.widgets.get('lo_int_lim'))
+        hi_int_lim = float(self.widgets.get('hi_int_lim'))
+
+        # Only map the most recent scans
+        map_fnames = scan_fnames[-MAX_MAP_SCANS:]
+
+        # Read in any new scans, reusing those already loaded for this day
+        cache_fpath, scan_cache = self.station_scan_cache.get(name, (None, {}))
+        if cache_fpath != fpath:
+            scan_cache = {}
+            self.station_scan_cache[name] = (fpath, scan_cache)
+        for fname in map_fnames:
+            if fname not in scan_cache:
+                scan_cache[fname] = read_scan_so2(
+                    f'{fpath}/{name}/so2/{fname}'
                 )
 
-            if i == 0:
-                shape = [len(scan_fnames[-5:]), len(scan_df['angle'])]
-                plotx = np.zeros(shape)
-                ploty = np.zeros(shape)
+        # Drop any scans that are no longer mapped
+        for fname in scan_cache.keys() - set(map_fnames):
+            del scan_cache[fname]
+
+        # Update the existing scan lines with the last 5 scans rather than
+        #  rebuilding the plot
+        last_fnames = scan_fnames[-5:][::-1]
+        legend = self.station_legends[name]
+        legend.clear()
+        for i, line in enumerate(self.station_scan_lines[name]):
+            if i >= len(last_fnames):
+                line.setData([], [])
+                continue
+
+            # Unpack the angle and SO2 data
+            fname = last_fnames[i]
+            angle, so2, int_av, _ = scan_cache[fname]
 
             # Check if the scans should be filtered
             if filter_spectra_flag:
-                mask = np.row_stack([
-                    scan_df['SO2'] < float(self.widgets.get('lo_scd_lim')),
-                    scan_df['SO2'] > float(self.widgets.get('hi_scd_lim')),
-                    scan_df['int_av'] < float(self.widgets.get('lo_int_lim')),
-                    scan_df['int_av'] > float(self.widgets.get('hi_int_lim'))
-                ]).any(axis=0)
-                plotx[i] = scan_df['angle'].to_numpy()
-                ploty[i] = np.where(mask, 0, scan_df['SO2'].to_numpy())
-            else:
-                plotx[i] = scan_df['angle'].to_numpy()
-                ploty[i] = scan_df['SO2'].to_numpy()
+                mask = (so2 < lo_scd_lim) | (so2 > hi_scd_lim) \
+                    | (int_av < lo_int_lim) | (int_av > hi_int_lim)
+                so2 = np.where(mask, 0, so2)
 
-            # Get the scan time from the filename to use as a label
-            labels.append(f'{fname[9:11]}:{fname[11:13]}')
+            # Replace any nans with zeros and plot, using the scan time from
+            #  the filename as a label
+            line.setData(angle, np.nan_to_num(so2))
+            legend.addItem(line, f'{fname[9:11]}:{fname[11:13]}')
 
-        # Replace any nans with zeros
-        ploty = np.nan_to_num(ploty)
-
-        for i in range(shape[0]):
-
-            if i == 0:
-                width = 4
-            else:
-                width = 2
-
-            # Plot the line
-            line = pg.PlotCurveItem(plotx[i], ploty[i],
-                                    pen=pg.mkPen(color=COLORS[i], width=width))
-            self.station_axes[name][0].addItem(line)
-            legend.addItem(line, labels[i])
-
-        scan_angle = np.full([len(scan_fnames), len(plotx[0])], np.nan)
-        scan_time = np.full([len(scan_fnames), len(plotx[0])], np.nan)
-        scan_so2 = np.full([len(scan_fnames), len(plotx[0])], np.nan)
-        scan_int = np.full([len(scan_fnames), len(plotx[0])], np.nan)
-
-        for i, fname in enumerate(scan_fnames):
-
-            # Load the scan file, unpacking the angle and SO2 data
-            with xr.open_dataset(f'{fpath}/{name}/so2/{fname}') as da:
-                scan_df = da.to_dataframe()
-                scan_df['angle'] = da.coords['angle']
-                scan_df['time'] = pd.date_range(
-                    da.attrs['scan_start_time'],
-                    da.attrs['scan_end_time'],
-                    da.attrs['specs_per_scan']
-                )
-            scan_angle[i] = scan_df['angle'].to_numpy()
-            scan_so2[i] = scan_df['SO2'].to_numpy()
-            scan_int[i] = scan_df['int_av']
-
-            # Pull the time and convert to a unix timestamp
-            for j, ts in enumerate(scan_df['time']):
-                try:
-                    ds = pd.Timedelta('1s')
-                    ts_ux = (ts - pd.Timestamp("1970-01-01")) // ds
-                    scan_time[i, j] = ts_ux
-                except ValueError:
-                    pass
-
-        # Flatten the data
-        scan_angle = scan_angle.flatten()
-        scan_time = scan_time.flatten()
-        scan_so2 = scan_so2.flatten()
-        scan_int = scan_int.flatten()
+        # Join the cached angle, SO2, intensity and time data for the map
+        scan_angle, scan_so2, scan_int, scan_time = [
+            np.concatenate(data).astype(float)
+            for data in zip(*[scan_cache[fname] for fname in map_fnames])
+        ]
 
         # Check if the scans should be filtered
         if filter_spectra_flag:
-            mask = np.row_stack([
-                scan_so2 < float(self.widgets.get('lo_scd_lim')),
-                scan_so2 > float(self.widgets.get('hi_scd_lim')),
-                scan_int < float(self.widgets.get('lo_int_lim')),
-                scan_int > float(self.widgets.get('hi_int_lim'))
-            ]).any(axis=0)
+            mask = (scan_so2 < lo_scd_lim) | (scan_so2 > hi_scd_lim) \
+                | (scan_int < lo_int_lim) | (scan_int > hi_int_lim)
             scan_so2 = np.where(mask, 0, scan_so2)
 
         self.station_so2_data[name] = scan_so2
 
-        # # Get the colormap limits
-        map_lo_lim, map_hi_lim = self.station_cbar[name].levels()
-
-        # Normalise the data and convert to colors
-        norm_values = (scan_so2 - map_lo_lim) / (map_hi_lim - map_lo_lim)
-        np.nan_to_num(norm_values, copy=False)
+        # Convert the data to colors
         try:
-            pens = [pg.mkPen(color=self.cmap.map(val))
-                    for val in norm_values]
-            brushes = [pg.mkBrush(color=self.cmap.map(val))
-                       for val in norm_values]
+            pens, brushes = self._map_styles(name, scan_so2)
         except AttributeError:
             pens = None
             brushes = None
@@ -1164,29 +1305,51 @@ class MainWindow(QMainWindow):
         self.station_so2_map[name].setData(x=scan_time, y=scan_angle,
                                            pen=pens, brush=brushes)
 
+    def _map_styles(self, name, scan_so2):
+        """Get the pen and brush for each point in the SO2 map."""
+        # Get the colormap limits
+        map_lo_lim, map_hi_lim = self.station_cbar[name].levels()
+
+        # Normalise the data and convert to lookup table indices
+        norm_values = (scan_so2 - map_lo_lim) / (map_hi_lim - map_lo_lim)
+        np.nan_to_num(norm_values, copy=False)
+        idx = np.clip(np.rint(norm_values * (MAP_COLOR_LEVELS - 1)),
+                      0, MAP_COLOR_LEVELS - 1).astype(int)
+
+        return self.map_pens[idx], self.map_brushes[idx]
+
     def _update_map_colors(self, name):
         try:
             scan_time, scan_angle = self.station_so2_map[name].getData()
             scan_so2 = self.station_so2_data[name]
 
-            # Get the colormap limits
-            map_lo_lim, map_hi_lim = self.station_cbar[name].levels()
-
-            # Normalise the data and convert to colors
-            norm_values = (scan_so2 - map_lo_lim) / (map_hi_lim - map_lo_lim)
-            np.nan_to_num(norm_values, copy=False)
-
-            pens = [pg.mkPen(color=self.cmap.map(val)) for val in norm_values]
-            brushes = [pg.mkBrush(color=self.cmap.map(val))
-                       for val in norm_values]
+            # Convert the data to colors
+            pens, brushes = self._map_styles(name, scan_so2)
 
             self.station_so2_map[name].setData(x=scan_time, y=scan_angle,
                                                pen=pens, brush=brushes)
         except ValueError:
             pass
 
-    def update_flux_plots(self, mode):
-        """Display the calculated fluxes."""
+    def update_flux_plots(self, mode, flux_results=None):
+        """Display the calculated fluxes.
+
+        Fluxes passed in flux_results are drawn directly. Other stations are
+        read from their flux file if it has changed.
+        """
+        if flux_results is None:
+            flux_results = {}
+
+        # If the flux plots are hidden or this is not a plotting cycle, draw
+        #  them later
+        if (self.stationTabHolder.currentIndex() != 0
+                or (mode == 'RealTime' and not self._plot_cycle_due())):
+            if mode != self.stale_flux_mode:
+                self.stale_flux_results = {}
+            self.stale_flux_mode = mode
+            self.stale_flux_results.update(flux_results)
+            return
+
         if mode == 'RealTime':
             resfpath = self.widgets.get('sync_folder')
         elif mode == 'Post':
@@ -1202,19 +1365,50 @@ class MainWindow(QMainWindow):
             flux_fpath = f'{resfpath}/{self.analysis_date}/{name}/' \
                          + f'{self.analysis_date}_{name}_fluxes.csv'
 
-            # Read the flux file
             try:
-                flux_df = pd.read_csv(flux_fpath, parse_dates=['Time [UTC]'])
+                file_stamp = (flux_fpath, os.path.getmtime(flux_fpath))
             except FileNotFoundError:
-                logger.warning(f'Flux file not found for {name}!')
-                continue
+                file_stamp = None
+
+            # Use the fluxes in memory if given
+            if name in flux_results:
+                flux_df = flux_results[name]
 
-            # Extract the data, converting to UNIX time for the x-axis
-            xdata = np.array([t.timestamp() for t in flux_df['Time [UTC]']])
-            flux = flux_df['Flux [kg/s]'].to_numpy()
-            flux_err = flux_df['Flux Err [kg/s]'].to_numpy()
-            plume_alt = flux_df['Plume Altitude [m]'].to_numpy()
-            plume_dir = flux_df['Plume Direction [deg]'].to_numpy()
+                # Mark the real time flux file as drawn
+                if mode == 'RealTime' and file_stamp is not None:
+                    self.flux_file_stamps[name] = file_stamp
+                else:
+                    self.flux_file_stamps.pop(name, None)
+
+            # Otherwise only read and redraw the fluxes if the file has changed
+            else:
+                if file_stamp is None:
+                    logger.warning(f'Flux file not found for {name}!')
+                    continue
+
+                if self.flux_file_stamps.get(name) == file_stamp:
+                    if name in self.flux_time_ranges:
+                        min_time.append(self.flux_time_ranges[name][0])
+                        max_time.append(self.flux_time_ranges[name][1])
+                    continue
+
+                # Read the flux file
+                try:
+                    flux_df = pd.read_csv(flux_fpath,
+                                          parse_dates=['Time [UTC]'])
+                except FileNotFoundError:
+                    logger.warning(f'Flux file not found for {name}!')
+                    continue
+                self.flux_file_stamps[name] = file_stamp
+
+            # Extract the data, converting the UTC times to UNIX time for the
+            #  x-axis in one pass
+            scan_times = flux_df['Time [UTC]'].to_numpy(dtype='datetime64[s]')
+            xdata = (scan_times - UNIX_EPOCH) / np.timedelta64(1, 's')
+            flux = flux_df['Flux [kg/s]'].to_numpy(dtype=float)
+            flux_err = flux_df['Flux Err [kg/s]'].to_numpy(dtype=float)
+            plume_alt = flux_df['Plume Altitude [m]'].to_numpy(dtype=float)
+            plume_dir = flux_df['Plume Direction [deg]'].to_numpy(dtype=float)
 
             # Also update the flux plots
             self.flux_lines[name][0].setData(x=xdata, y=flux, height=flux_err)
@@ -1223,17 +1417,18 @@ class MainWindow(QMainWindow):
             self.flux_lines[name][3].setData(x=xdata, y=plume_dir)
 
             try:
-                min_time.append(np.nanmin(xdata))
-                max_time.append(np.nanmax(xdata))
+                self.flux_time_ranges[name] = [np.nanmin(xdata),
+                                               np.nanmax(xdata)]
+                min_time.append(self.flux_time_ranges[name][0])
+                max_time.append(self.flux_time_ranges[name][1])
             except ValueError:
-                pass
+                self.flux_time_ranges.pop(name, None)
 
         # Scale the x-axis (avoids issues with stations without fluxes)
         try:
             xlim_lo = min(min_time)
             xlim_hi = min(max_time)
-            for ax in self.flux_axes:
-                ax.setXRange(xlim_lo, xlim_hi)
+            self.flux_axes[0].setXRange(xlim_lo, xlim_hi)
         except ValueError:
             pass
 
@@ -1308,7 +1503,7 @@ class MainWindow(QMainWindow):
                     if key == 'theme':
                         self.theme = value
                     elif key == 'stations':
-                        for name in self.stations.copy().keys():
+                        for name in list(self.stations):
                             self.del_station(name)
                         for name, info in value.items():
                             self.add_station(name, **info)
@@ -1379,15 +1574,8 @@ class MainWindow(QMainWindow):
             ax.getAxis('left').setTextPen(pen)
             ax.getAxis('bottom').setTextPen(pen)
 
-        for name, station in self.stations.items():
-            self.station_graphwin[name].setBackground('k')
-            for ax in self.station_axes[name]:
-                ax.getAxis('left').setPen(pen)
-                ax.getAxis('right').setPen(pen)
-                ax.getAxis('top').setPen(pen)
-                ax.getAxis('bottom').setPen(pen)
-                ax.getAxis('left').setTextPen(pen)
-                ax.getAxis('bottom').setTextPen(pen)
+        for name in self.station_graphwin:
+            self._set_station_theme(name, 'k', pen)
 
     @pyqtSlot()
     def changeThemeLight(self):
@@ -1405,15 +1593,19 @@ class MainWindow(QMainWindow):
             ax.getAxis('left').setTextPen(pen)
             ax.getAxis('bottom').setTextPen(pen)
 
-        for name, station in self.stations.items():
-            self.station_graphwin[name].setBackground('w')
-            for ax in self.station_axes[name]:
-                ax.getAxis('left').setPen(pen)
-                ax.getAxis('right').setPen(pen)
-                ax.getAxis('top').setPen(pen)
-                ax.getAxis('bottom').setPen(pen)
-                ax.getAxis('left').setTextPen(pen)
-                ax.getAxis('bottom').setTextPen(pen)
+        for name in self.station_graphwin:
+            self._set_station_theme(name, 'w', pen)
+
+    def _set_station_theme(self, name, background, pen):
+        """Set the background and axis colours of the station graphs."""
+        self.station_graphwin[name].setBackground(background)
+        for ax in self.station_axes[name]:
+            ax.getAxis('left').setPen(pen)
+            ax.getAxis('right').setPen(pen)
+            ax.getAxis('top').setPen(pen)
+            ax.getAxis('bottom').setPen(pen)
+            ax.getAxis('left').setTextPen(pen)
+            ax.getAxis('bottom').setTextPen(pen)
 
 
 class NewStationWizard(QDialog):
@@ -1612,7 +1804,12 @@ def main():
     view.show()
 
     # Execute the main loop
-    sys.exit(app.exec_())
+    exit_code = app.exec_()
+
+    # Flush any remaining log records to file
+    log_listener.stop()
+
+    sys.exit(exit_code)
 
 
 if __name__ == '__main__':
@@ -4,7 +4,6 @@ import yaml
 import logging
 import traceback
 from datetime import datetime
-import seabreeze.spectrometers as sb
 
 from openso2.scanner import Scanner
 from ifit.spectrometers import Spectrometer
@@ -74,6 +73,7 @@ except Exception:
 print('Testing spectrometer...')
 
 try:
+    import seabreeze.spectrometers as sb
     devs = sb.list_devices()
     print('Available spectrometers:')
     if len(devs) == 0:
@@ -46,34 +46,45 @@ class GPS():
         self.thread.start()
 
     def _updater(self):
-        while self.running:
+        # Open the GPS file stream once, rather than for every sentence. It
+        #  is line buffered so each sentence is written out straight away
+        stream = None
+        if self.filename is not None and self.filename != '':
             try:
-                ser_bytes = self.serial_port.readline()
-                decoded_bytes = ser_bytes.decode('utf-8')
-                if self.filename is not None and self.filename != '':
-                    try:
-                        with open(self.filename, 'a') as w:
-                            w.write(decoded_bytes.strip() + '\n')
-                    except FileNotFoundError:
-                        logger.warning(f'Unable to find file {self.filename}'
-                                       + ' Disabling GPS file stream.')
-                        self.filename = None
+                stream = open(self.filename, 'a', buffering=1)
+            except FileNotFoundError:
+                logger.warning(f'Unable to find file {self.filename}'
+                               + ' Disabling GPS file stream.')
+                self.filename = None
 
-                # Exctract location information
-                data = decoded_bytes.split(",")
+        try:
+            while self.running:
+                try:
+                    ser_bytes = self.serial_port.readline()
+                    decoded_bytes = ser_bytes.decode('utf-8')
+                    if stream is not None:
+                        stream.write(decoded_bytes.strip() + '\n')
+
+                    # Exctract location information
+                    data = decoded_bytes.split(",")
+
+                    if 'GGA' in data[0]:
+                        self._parse_gpgga(data)
 
-                if 'GGA' in data[0]:
-                    self._parse_gpgga(data)
+                    if 'RMC' in data[0]:
+                        self._parse_gprmc(data)
 
-                if 'RMC' in data[0]:
-                    self._parse_gprmc(data)
+                except UnicodeDecodeError:
+                    time.sleep(1)
 
-            except UnicodeDecodeError:
-                time.sleep(1)
+                except serial.SerialException:
+                    logger.warning('GPS disconnected!')
+                    self.close()
 
-            except serial.SerialException:
-                logger.warning('GPS disconnected!')
-                self.close()
+        finally:
+            # Close the file stream, even if the loop stops with an error
+            if stream is not None:
+                stream.close()
 
     def _parse_gpgga(self, data):
         """Parse GPGGA string."""
@@ -176,17 +187,19 @@ class GPS():
             True if a fix is acquired. Otherwise False
         """
         logger.info('Waiting for GPS fix...')
-        t0 = datetime.now()
-        while (datetime.now() - t0).total_seconds() < time_to_wait:
+        deadline = time.monotonic() + time_to_wait
+        while time.monotonic() < deadline:
 
-            flags = [~np.isnan(self.lat), ~np.isnan(self.lon),
-                     self.timestamp is not None, self.datestamp is not None]
-
-            if np.array(flags).all():
+            if (not np.isnan(self.lat) and not np.isnan(self.lon)
+                    and self.timestamp is not None
+                    and self.datestamp is not None):
                 logger.info('GPS fix acquired')
                 return [datetime.combine(self.datestamp, self.timestamp),
                         self.lat, self.lon, self.alt, True]
 
+            # Wait briefly for the reader thread rather than spinning
+            time.sleep(0.1)
+
         # If no fix is achieved, report and move on
         logger.warning(f'No GPS fix acquired after {time_to_wait} seconds')
         return datetime.now(), self.lat, self.lon, self.alt, False
@@ -12,13 +12,12 @@ def super_gaussian(grid, w, k, a_w, a_k, shift=0, amp=1, offset=0):
     # Compute A
     A = k / (2 * w * gamma(1/k))
 
-    # Form empty array
-    ils = np.zeros(len(grid))
-
-    # Iterate over x grid. If negative do one thing, if positive do the other
-    ils = np.array([left_func(x, w, k, a_w, a_k) if x <= 0
-                    else right_func(x, w, k, a_w, a_k)
-                    for x in grid])
+    # Use the left function parameters for x <= 0 and the right function
+    # parameters for x > 0, evaluating the whole grid at once
+    left = grid <= 0
+    width = np.where(left, w - a_w, w + a_w)
+    power = np.where(left, k - a_k, k + a_k)
+    ils = np.exp(-np.power(np.abs(grid / width), power))
 
     # Shift the lineshape
     if shift != 0:
@@ -86,6 +85,6 @@ def make_ils(interval, FWEM, k=2, a_w=0, a_k=0):
     # Make the line shape
     ils = super_gaussian(grid, w, k, a_w, a_k)
 
-    ils = np.divide(ils, sum(ils))
+    ils = np.divide(ils, np.sum(ils))
 
     return ils
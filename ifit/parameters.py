@@ -111,8 +111,12 @@ class Parameters(OrderedDict):
                 [(p.hi_bound) for p in self.values() if p.vary]]
 
     def make_copy(self):
-        """Return a deep copy of the Parameters object."""
-        return copy.deepcopy(self)
+        """Return a deep copy of the Parameters object.
+
+        The attributes of each Parameter are immutable, so copying each
+        Parameter is enough and is much quicker than copy.deepcopy.
+        """
+        return Parameters((name, copy.copy(par)) for name, par in self.items())
 
     def pretty_print(self, mincolwidth=7, precision=4, cols='basic'):
         """Print the parameters in a nice way.
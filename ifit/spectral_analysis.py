@@ -1,8 +1,11 @@
+import os
 import logging
+import hashlib
+import zipfile
 import numpy as np
 from scipy.optimize import curve_fit
-from scipy.interpolate import griddata
-from scipy.signal import savgol_filter
+from scipy.interpolate import griddata, make_interp_spline
+from scipy.fft import rfft, irfft, next_fast_len
 
 from ifit.make_ils import make_ils
 
@@ -63,6 +66,17 @@ class Analyser():
         The limit of the spike size to remove. Defined as the difference
         between the raw spectrum and a savgol filtered spectrum. The
         default is None
+    dtype : numpy dtype, optional
+        The float type used to store the solar spectrum and cross-sections.
+        Setting np.float32 halves their memory. The fit derivatives are found
+        by finite differences, which float32 cannot always resolve, so check
+        the fit results before using it. Fitting with analytic_jac=True
+        limits this to the shift, LDF and ILS derivatives. The default is
+        float
+    cache_dir : str, optional
+        If given, the solar spectrum and cross-sections interpolated onto the
+        model grid are saved in this folder and reused by later Analysers
+        with the same files and model grid. The default is None
 
     Attributes
     ----------
@@ -88,14 +102,23 @@ class Analyser():
     xsecs : dict
         The cross-sections to use in the forward model, interpolated onto the
         model grid
+    gas_names : list
+        The names of the parameters with a cross-section, in the order of the
+        rows of xsec_arr
+    xsec_arr : 2D numpy array
+        The cross-sections stacked into a single (n_gas, n_grid) array. The
+        values of xsecs are views of its rows
     """
 
     def __init__(self, params, fit_window, frs_path, model_padding=1.0,
                  model_spacing=0.01, flat_flag=False, flat_path=None,
                  stray_flag=False, stray_window=[280, 290], dark_flag=False,
                  ils_type='Manual', ils_path=None, despike_flag=False,
-                 spike_limit=None, bad_pixels=None):
+                 spike_limit=None, bad_pixels=None, dtype=float,
+                 cache_dir=None):
         """Initialise the model for the analyser."""
+        self.dtype = np.dtype(dtype)
+
         # Set the initial estimate for the fit parameters
         self.params = params.make_copy()
         self.p0 = self.params.fittedvalueslist()
@@ -109,6 +132,7 @@ class Analyser():
         stop = fit_window[1] + model_padding + model_spacing
         self.init_grid = np.arange(start, stop, step=model_spacing)
         self.model_grid = self.init_grid.copy()
+        self._set_grid_terms()
 
         # ---------------------------------------------------------------------
         # Flat Spectrum
@@ -143,7 +167,7 @@ class Analyser():
 
                 # Interpolate the measured ILS onto the model grid spacing
                 grid_ils = np.arange(x_ils[0], x_ils[-1], model_spacing)
-                ils = griddata(x_ils, y_ils, grid_ils, 'cubic')
+                ils = interp_reference(x_ils, y_ils, grid_ils)
                 self.ils = ils / np.sum(ils)
                 self.generate_ils = False
 
@@ -185,10 +209,8 @@ class Analyser():
 
         # Import solar reference spectrum
         logger.info('Importing solar reference spectrum...')
-        sol_x, sol_y = np.loadtxt(frs_path, unpack=True)
-
-        # Interpolate onto model_grid
-        self.init_frs = griddata(sol_x, sol_y, self.model_grid, method='cubic')
+        self.init_frs = load_reference(frs_path, self.model_grid, cache_dir)
+        self.init_frs = self.init_frs.astype(self.dtype, copy=False)
         self.frs = self.init_frs.copy()
 
         logger.info('Solar reference spectrum imported')
@@ -199,8 +221,9 @@ class Analyser():
 
         logger.info('Importing gas cross-sections...')
 
-        # Create an empty dictionary to hold the gas cross-sections
-        self.init_xsecs = {}
+        # Create empty lists to hold the gas names and cross-sections
+        self.gas_names = []
+        init_xsecs = []
 
         # Cycle through the parameters
         for name, param in self.params.items():
@@ -209,17 +232,19 @@ class Analyser():
             if param.xpath is not None:
                 logger.info(f'Importing {name} reference spectrum...')
 
-                # Read in the cross-section
-                x, xsec = np.loadtxt(param.xpath, unpack=True)
-
-                # Interpolate onto the model grid
-                self.init_xsecs[name] = griddata(x, xsec, self.model_grid,
-                                                 method='cubic')
+                # Read in the cross-section on the model grid
+                self.gas_names.append(name)
+                init_xsecs.append(load_reference(param.xpath, self.model_grid,
+                                                 cache_dir))
 
                 logger.info(f'{name} cross-section imported')
 
-        # Create a copy of the cross-sections
-        self.xsecs = self.init_xsecs.copy()
+        # Stack the cross-sections into a single array, one row per gas
+        self.init_xsec_arr = np.reshape(
+            init_xsecs, (len(self.gas_names), len(self.model_grid))
+        ).astype(self.dtype, copy=False)
+        self._set_param_layout()
+        self._set_xsecs(self.init_xsec_arr)
 
         # ---------------------------------------------------------------------
         # Other model settings
@@ -237,6 +262,21 @@ class Analyser():
         self.spike_limit = spike_limit
         self.bad_pixels = bad_pixels
 
+        # Cache for the wavelength window slices used in pre-processing
+        self._slice_grid = None
+        self._slices = None
+
+        # Cache for the Fourier transform of the ILS used in the convolution
+        self._ils_fft_src = None
+        self._ils_fft = None
+
+        # Intermediate spectra from the last forward model run
+        self._model_terms = None
+
+        # The last ILS generated from fitted parameters
+        self._gen_ils_params = None
+        self._gen_ils = None
+
 # =============================================================================
 #   Spectrum Pre-processing
 # =============================================================================
@@ -262,6 +302,9 @@ class Analyser():
         # Unpack spectrum
         x, y = spectrum
 
+        # Get the index slices of the stray, fit and flat windows
+        stray_slice, fit_slice, flat_slice = self._window_slices(x)
+
         # Remove the dark spectrum from the measured spectrum
         if self.dark_flag:
             try:
@@ -272,19 +315,20 @@ class Analyser():
 
         # Remove stray light
         if self.stray_flag:
-            stray_idx = np.where(np.logical_and(x >= self.stray_window[0],
-                                                x <= self.stray_window[1]))
+            stray_y = y[stray_slice]
 
-            if len(stray_idx[0]) == 0:
-                logger.warn('No stray window outside spectrum, disabling '
-                            + 'stray correction')
+            if len(stray_y) == 0:
+                logger.warning('No stray window outside spectrum, disabling '
+                               + 'stray correction')
                 self.stray_flag = False
 
             else:
-                y = np.subtract(y, np.average(y[stray_idx]))
+                y = np.subtract(y, np.average(stray_y))
 
         # Run de-spike
         if self.despike_flag:
+            # scipy.signal is slow to import, so only load it when needed
+            from scipy.signal import savgol_filter
 
             # Run a savgol filter on the spectrum
             sy = savgol_filter(y, 11, 3)
@@ -294,29 +338,24 @@ class Analyser():
 
             # Find any points that are over the spike limit and replace with
             # smoothed values
-            spike_idx = np.where(dspec > self.spike_limit)[0]
-            for i in spike_idx:
-                y[i] = sy[i]
+            y = np.where(dspec > self.spike_limit, sy, y)
 
-        # Remove bad pixels
+        # Remove bad pixels, replacing them with the average of their
+        # neighbours. This works on a copy to leave the input unchanged
         if self.bad_pixels is not None:
-            for i in self.bad_pixels:
-                y[i] = np.average([y[i-1], y[i+1]])
+            bad_idx = np.asarray(self.bad_pixels)
+            y = np.array(y, dtype=float)
+            y[bad_idx] = 0.5 * (y[bad_idx-1] + y[bad_idx+1])
 
         # Cut desired wavelength window
-        fit_idx = np.where(np.logical_and(x >= self.fit_window[0],
-                                          x <= self.fit_window[1]))
-        grid = x[fit_idx]
-        spec = y[fit_idx]
+        grid = x[fit_slice]
+        spec = y[fit_slice]
 
         # Divide by flat spectrum
         if self.flat_flag:
 
-            # Unpack the flat spectrum and trim to the fit window
-            flat_x, flat_y = self.flat
-            flat_idx = np.where(np.logical_and(flat_x >= self.fit_window[0],
-                                               flat_x <= self.fit_window[1]))
-            flat = flat_y[flat_idx]
+            # Trim the flat spectrum to the fit window
+            flat = self.flat[1][flat_slice]
 
             # Divide the emasured spectrum by the flat spectrum
             try:
@@ -327,13 +366,52 @@ class Analyser():
 
         return np.row_stack([grid, spec])
 
+    def _window_slices(self, x):
+        """Get the index slices of the stray, fit and flat windows.
+
+        The windows are contiguous on the (ascending) wavelength grids, so
+        they are found with searchsorted. The result is cached against the
+        wavelength array, so is only worked out once for a scan.
+
+        Parameters
+        ----------
+        x : numpy array
+            The wavelength grid of the measured spectrum.
+
+        Returns
+        -------
+        stray_slice, fit_slice, flat_slice : slice
+            The index slices for the stray light window and fit window on
+            the spectrum grid, and the fit window on the flat spectrum grid.
+        """
+        if x is self._slice_grid:
+            return self._slices
+
+        def window_slice(grid, window):
+            lo = np.searchsorted(grid, window[0], side='left')
+            hi = np.searchsorted(grid, window[1], side='right')
+            return slice(lo, hi)
+
+        stray_slice = window_slice(x, self.stray_window)
+        fit_slice = window_slice(x, self.fit_window)
+        if self.flat_flag:
+            flat_slice = window_slice(self.flat[0], self.fit_window)
+        else:
+            flat_slice = None
+
+        self._slice_grid = x
+        self._slices = stray_slice, fit_slice, flat_slice
+
+        return self._slices
+
 # =============================================================================
 #   fit_spectrum
 # =============================================================================
 
     def fit_spectrum(self, spectrum, update_params=False, resid_limit=None,
                      resid_type='Percentage', int_limit=None, calc_od=[],
-                     pre_process=True, interp_method='cubic', fit_window=None):
+                     pre_process=True, interp_method='cubic', fit_window=None,
+                     analytic_jac=False):
         """Fit the supplied spectrum.
 
         Parameters
@@ -367,6 +445,11 @@ class Analyser():
             Upper and lower limits of the fit window. This superceeds the main
             fit_window of the Analyser but must be contained within the window
             used to initialise the Analyser. Default is None.
+        analytic_jac : bool, optional, default=False
+            If True the fit uses fwd_jacobian, which finds the derivatives
+            for the polynomial and gas parameters analytically. This saves a
+            forward model run per parameter on each fit iteration. If False
+            curve_fit estimates them all by finite differences.
 
         Returns
         -------
@@ -375,33 +458,7 @@ class Analyser():
         """
         # If a new fit window is given, trim the cross-sections down
         if fit_window is not None:
-
-            # Check the new window is within the old one
-            a = fit_window[0] < self.init_fit_window[0]
-            b = fit_window[1] > self.init_fit_window[1]
-            if a or b:
-                logger.error('New fit window must be within initial fit'
-                             + 'window!')
-                raise ValueError
-
-            # Pad the fit window
-            pad_window = [fit_window[0] - self.model_padding,
-                          fit_window[1] + self.model_padding]
-
-            # Trim the model grid to the new fit window
-            mod_idx = np.where(np.logical_and(self.init_grid >= pad_window[0],
-                                              self.init_grid <= pad_window[1]))
-            self.model_grid = self.init_grid[mod_idx]
-
-            # Trim the FRS to the new fit window
-            self.frs = self.init_frs[mod_idx]
-
-            # Trim the gas cross-sections to the new fit window
-            for key in self.init_xsecs.keys():
-                self.xsecs[key] = self.init_xsecs[key][mod_idx]
-
-            # Update the fit window attribute
-            self.fit_window = fit_window
+            self._prepare_for_window(fit_window)
 
         # Check is spectrum requires preprocessing
         if pre_process:
@@ -413,11 +470,16 @@ class Analyser():
         # Unpack the spectrum
         grid, spec = spectrum
 
-        if min(spec) > 0:
+        if np.min(spec) > 0:
 
             # Fit the spectrum
             try:
-                popt, pcov = curve_fit(self.fwd_model, grid, spec, self.p0)
+                if analytic_jac:
+                    jac = self.fwd_jacobian
+                else:
+                    jac = None
+                popt, pcov = curve_fit(self.fwd_model, grid, spec, self.p0,
+                                       jac=jac)
 
                 # Calculate the parameter error
                 perr = np.sqrt(np.diag(pcov))
@@ -449,6 +511,113 @@ class Analyser():
 
         return fit_result
 
+    def _prepare_for_window(self, fit_window):
+        """Trim the model grid, FRS and cross-sections to a new fit window.
+
+        This is skipped if the window has not changed, so it only runs once
+        when fitting many spectra with the same window.
+
+        Parameters
+        ----------
+        fit_window : tuple
+            Upper and lower limits of the fit window. Must be contained
+            within the window used to initialise the Analyser.
+        """
+        # Skip if the model is already set up for this window
+        if list(fit_window) == list(self.fit_window):
+            return
+
+        # Check the new window is within the old one
+        a = fit_window[0] < self.init_fit_window[0]
+        b = fit_window[1] > self.init_fit_window[1]
+        if a or b:
+            logger.error('New fit window must be within initial fit'
+                         + 'window!')
+            raise ValueError
+
+        # Pad the fit window
+        pad_window = [fit_window[0] - self.model_padding,
+                      fit_window[1] + self.model_padding]
+
+        # Trim the model grid to the new fit window
+        mod_idx = np.where(np.logical_and(self.init_grid >= pad_window[0],
+                                          self.init_grid <= pad_window[1]))
+        self.model_grid = self.init_grid[mod_idx]
+        self._set_grid_terms()
+
+        # Trim the FRS to the new fit window
+        self.frs = self.init_frs[mod_idx]
+
+        # Trim the gas cross-sections to the new fit window
+        self._set_xsecs(self.init_xsec_arr[:, mod_idx[0]])
+
+        # Update the fit window attribute and clear the window slices
+        self.fit_window = fit_window
+        self._slice_grid = None
+
+    def _set_grid_terms(self):
+        """Precompute the forward model terms that depend on the model grid.
+
+        The background, offset and shift polynomials are evaluated as a
+        matrix product of the coefficients with a Vandermonde matrix, with
+        columns from the highest power down as in np.polyval.
+        """
+        def npoly(key):
+            return len([name for name in self.params if key in name])
+
+        zero_grid = self.model_grid - self.model_grid.min()
+        self._bg_vander = np.vander(self.model_grid, npoly('bg_poly'))
+        self._offset_vander = np.vander(self.model_grid, npoly('offset'))
+        self._shift_vander = np.vander(zero_grid, npoly('shift'))
+        self._rayleigh_scale = self.model_grid**-4
+
+    def _set_param_layout(self):
+        """Index the parameters for the forward model.
+
+        The forward model fills an array of all the parameter values on each
+        call, so the positions of the fitted parameters, polynomial
+        coefficients, gases and other named parameters are found once here.
+        As with p0, this uses the parameters given when the Analyser was
+        created.
+        """
+        names = list(self.params)
+        self._p_values = np.array([par.value for par in self.params.values()],
+                                  dtype=float)
+        self._vary_idx = [i for i, par in enumerate(self.params.values())
+                          if par.vary]
+
+        # Polynomial coefficients, in the order of the Vandermonde columns
+        self._bg_idx = [i for i, n in enumerate(names) if 'bg_poly' in n]
+        self._offset_idx = [i for i, n in enumerate(names) if 'offset' in n]
+        self._shift_idx = [i for i, n in enumerate(names) if 'shift' in n]
+
+        # Gases, in the order of the cross-section array rows
+        self._gas_idx = [names.index(gas) for gas in self.gas_names]
+        self._plume_gas = np.array([self.params[gas].plume_gas
+                                    for gas in self.gas_names], dtype=bool)
+        gas_idx = np.array(self._gas_idx, dtype=int)
+        self._plume_gas_idx = gas_idx[self._plume_gas]
+        self._sky_gas_idx = gas_idx[~self._plume_gas]
+
+        # Light dilution and ILS parameters
+        if 'LDF' in names:
+            self._ldf_idx = names.index('LDF')
+        else:
+            self._ldf_idx = None
+        ils_keys = ['fwem', 'k', 'a_w', 'a_k']
+        self._ils_idx = [names.index(key) for key in ils_keys if key in names]
+
+    def _set_xsecs(self, xsec_arr):
+        """Set the cross-section array and the per-gas views of its rows.
+
+        The plume and sky gas cross-sections are also split into separate
+        arrays for the forward model.
+        """
+        self.xsec_arr = np.ascontiguousarray(xsec_arr)
+        self.xsecs = dict(zip(self.gas_names, self.xsec_arr))
+        self._plume_xsec_arr = self.xsec_arr[self._plume_gas]
+        self._sky_xsec_arr = self.xsec_arr[~self._plume_gas]
+
 # =============================================================================
 #   Forward Model
 # =============================================================================
@@ -479,100 +648,229 @@ class Analyser():
         fit, array
             Fitted spectrum interpolated onto the spectrometer wavelength grid
         """
-        # Get dictionary of fitted parameters
-        params = self.params
-        p = params.valuesdict()
-
-        # Update the fitted parameter values with those supplied to the forward
-        # model
-        i = 0
-        for par in params.values():
-            if par.vary:
-                p[par.name] = p0[i]
-                i += 1
-            else:
-                p[par.name] = par.value
+        # Get the parameter values, updating the fitted parameters with those
+        # supplied to the forward model
+        values = self._p_values.copy()
+        values[self._vary_idx] = p0
 
         # Unpack polynomial parameters
-        bg_poly_coefs = [p[n] for n in p if 'bg_poly' in n]
-        offset_coefs = [p[n] for n in p if 'offset' in n]
-        shift_coefs = [p[n] for n in p if 'shift' in n]
+        bg_poly_coefs = values[self._bg_idx]
+        offset_coefs = values[self._offset_idx]
+        shift_coefs = values[self._shift_idx]
 
         # Construct background polynomial
-        bg_poly = np.polyval(bg_poly_coefs, self.model_grid)
+        bg_poly = np.dot(self._bg_vander, bg_poly_coefs)
         frs = np.multiply(self.frs, bg_poly)
 
-        # Create empty arrays to hold optical depth spectra
-        plm_gas_T = np.zeros((len(self.xsecs), len(self.model_grid)))
-        sky_gas_T = np.zeros((len(self.xsecs), len(self.model_grid)))
-
-        # Calculate the gas optical depth spectra
-        for n, gas in enumerate(self.xsecs):
-            if self.params[gas].plume_gas:
-                plm_gas_T[n] = (np.multiply(self.xsecs[gas], p[gas]))
-            else:
-                sky_gas_T[n] = (np.multiply(self.xsecs[gas], p[gas]))
-
-        # Sum the gas ODs
-        sum_plm_T = np.sum(np.vstack([plm_gas_T, sky_gas_T]), axis=0)
-        sky_plm_T = np.sum(sky_gas_T, axis=0)
+        # Calculate the sky and plume gas optical depths as a single matrix
+        # product each. The plume light passes through both
+        sky_plm_T = np.dot(values[self._sky_gas_idx], self._sky_xsec_arr)
+        sum_plm_T = np.dot(values[self._plume_gas_idx], self._plume_xsec_arr)
+        sum_plm_T += sky_plm_T
 
-        # Build the exponent term
-        plm_exponent = np.exp(-sum_plm_T)
-        sky_exponent = np.exp(-sky_plm_T)
-
-        # Build the complete model
-        sky_F = np.multiply(frs, sky_exponent)
-        plm_F = np.multiply(frs, plm_exponent)
+        # Build the exponent terms, reusing the optical depth arrays
+        plm_exponent = np.exp(np.negative(sum_plm_T, out=sum_plm_T),
+                              out=sum_plm_T)
+        sky_exponent = np.exp(np.negative(sky_plm_T, out=sky_plm_T),
+                              out=sky_plm_T)
 
         # Add effects of light dilution
-        if 'LDF' in p and p['LDF'] != 0:
+        if self._ldf_idx is not None and values[self._ldf_idx] != 0:
 
             # Calculate constant light dilution
-            ldf_const = - np.log(1-p['LDF'])*(310**4)
+            ldf_const = - np.log(1-values[self._ldf_idx])*(310**4)
 
             # Add wavelength dependancy to light dilution factor
-            rayleigh_scale = self.model_grid**-4
-            ldf = 1-np.exp(-ldf_const * rayleigh_scale)
+            ldf = 1-np.exp(-ldf_const * self._rayleigh_scale)
 
         else:
             ldf = 0
 
         # Construct the plume and diluting light spectra, scaling by the ldf
-        dilut_F = np.multiply(sky_F, ldf)
-        plume_F = np.multiply(plm_F, 1-ldf)
+        dilut_F = np.multiply(frs, sky_exponent)
+        dilut_F *= ldf
+        plume_F = np.multiply(frs, plm_exponent)
+        plume_F *= 1-ldf
 
         # Build the baseline offset polynomial
-        offset = np.polyval(offset_coefs, self.model_grid)
+        offset = np.dot(self._offset_vander, offset_coefs)
 
         # Combine the undiluted light, diluted light and offset
-        raw_F = np.add(dilut_F, plume_F) + offset
+        raw_F = np.add(dilut_F, plume_F)
+        raw_F += offset
 
         # Generate the ILS
         if self.generate_ils:
 
             # Unpack ILS params
-            ils = make_ils(self.model_spacing,
-                           p['fwem'],
-                           p['k'],
-                           p['a_w'],
-                           p['a_k'])
+            ils = self._generate_ils(values[self._ils_idx])
         else:
             ils = self.ils
 
         # Apply the ILS convolution
-        F_conv = np.convolve(raw_F, ils, 'same')
+        F_conv = self._convolve_ils(raw_F, ils)
 
         # Apply shift and stretch to the model_grid
-        zero_grid = self.model_grid - min(self.model_grid)
-        wl_shift = np.polyval(shift_coefs, zero_grid)
+        wl_shift = np.dot(self._shift_vander, shift_coefs)
         shift_model_grid = np.add(self.model_grid, wl_shift)
 
         # Interpolate onto measurement wavelength grid
-        fit = griddata(shift_model_grid, F_conv, x, method=self.interp_method)
+        fit = interp_model(shift_model_grid, F_conv, x, self.interp_method)
+
+        # Keep the intermediate spectra for fwd_jacobian, which is usually
+        # called for the same parameters straight after
+        self._model_terms = dict(
+            x=x, p0=p0, fit=fit, ldf=ldf, ils=ils,
+            sky_exponent=sky_exponent, plm_exponent=plm_exponent,
+            dilut_F=dilut_F, plume_F=plume_F,
+            shift_model_grid=shift_model_grid
+        )
 
         return fit
 
+    def fwd_jacobian(self, x, *p0):
+        """Jacobian of the forward model with respect to the fit parameters.
+
+        The model is linear in the background and offset polynomial
+        coefficients, and the gas amounts only appear in the optical depth.
+        Their derivatives are therefore calculated analytically on the model
+        grid, then passed through the same ILS convolution and interpolation
+        as the model. The remaining parameters (such as the shift, LDF and
+        ILS parameters) use forward differences with a step of at least eps.
+
+        Parameters
+        ----------
+        x, array
+            Measurement wavelength grid
+        *p0, floats
+            Forward model state vector. See fwd_model.
+
+        Returns
+        -------
+        jac, 2D array
+            The derivatives of the model, with shape (len(x), len(p0))
+        """
+        # Get the intermediate model spectra, running the model if the last
+        # call was not for these parameters
+        terms = self._model_terms
+        if terms is None or terms['x'] is not x or terms['p0'] != p0:
+            self.fwd_model(x, *p0)
+            terms = self._model_terms
+        fit = terms['fit']
+
+        # Light reaching the spectrometer before the baseline offset, and the
+        # same without the background polynomial
+        total_F = np.add(terms['dilut_F'], terms['plume_F'])
+        ldf = terms['ldf']
+        trans_F = self.frs * (np.multiply(terms['sky_exponent'], ldf)
+                              + np.multiply(terms['plm_exponent'], 1-ldf))
+
+        jac = np.empty((len(x), len(self._vary_idx)))
+
+        # Find the analytic derivatives on the model grid
+        lin_idx = []
+        lin_cols = []
+        for i, n in enumerate(self._vary_idx):
+            if n in self._bg_idx:
+                col = trans_F * self._bg_vander[:, self._bg_idx.index(n)]
+            elif n in self._offset_idx:
+                col = self._offset_vander[:, self._offset_idx.index(n)]
+            elif n in self._gas_idx:
+                g = self._gas_idx.index(n)
+                if self._plume_gas[g]:
+                    col = -self.xsec_arr[g] * terms['plume_F']
+                else:
+                    col = -self.xsec_arr[g] * total_F
+            else:
+                continue
+            lin_idx.append(i)
+            lin_cols.append(col)
+
+        # Convolve and interpolate them together
+        if lin_cols:
+            conv_cols = self._convolve_ils(np.column_stack(lin_cols),
+                                           terms['ils'])
+            jac[:, lin_idx] = interp_model(terms['shift_model_grid'],
+                                           conv_cols, x, self.interp_method)
+
+        # Use forward differences for the rest. The step is relative to the
+        # parameter value as in the MINPACK routine used by curve_fit, but
+        # is not allowed to shrink below eps, otherwise a parameter close to
+        # zero (such as the shift) gets a vanishing step and a zero column
+        eps = np.sqrt(np.finfo(float).eps)
+        p_step = np.array(p0, dtype=float)
+        for i in range(len(self._vary_idx)):
+            if i in lin_idx:
+                continue
+            h = eps * max(abs(p_step[i]), 1.0)
+            p_step[i] += h
+            jac[:, i] = (self.fwd_model(x, *p_step) - fit) / h
+            p_step[i] = p0[i]
+
+        return jac
+
+    def _generate_ils(self, ils_params):
+        """Make the ILS from its parameters.
+
+        The last ILS is kept and returned again if the parameters have not
+        changed, as happens for most forward model calls in the Jacobian.
+        Returning the same array also lets _convolve_ils reuse its Fourier
+        transform.
+
+        Parameters
+        ----------
+        ils_params : list
+            The fwem, k, a_w and a_k ILS parameters.
+
+        Returns
+        -------
+        numpy array
+            The ILS.
+        """
+        ils_params = tuple(ils_params)
+        if ils_params != self._gen_ils_params:
+            self._gen_ils = make_ils(self.model_spacing, *ils_params)
+            self._gen_ils_params = ils_params
+        return self._gen_ils
+
+    def _convolve_ils(self, spec, ils):
+        """Convolve a spectrum with the ILS.
+
+        This gives the same result as np.convolve(spec, ils, 'same'), but
+        multiplies the Fourier transforms instead. The transform of the ILS
+        is kept between calls, so it is only worked out again if the ILS or
+        the spectrum length changes.
+
+        Parameters
+        ----------
+        spec : numpy array
+            The spectrum to convolve, on the model grid. If 2D then each
+            column is convolved.
+        ils : numpy array
+            The ILS.
+
+        Returns
+        -------
+        numpy array
+            The convolved spectrum.
+        """
+        # Pad to a fast transform length that avoids wrapping around
+        nfull = len(spec) + len(ils) - 1
+        nfft = next_fast_len(nfull, real=True)
+
+        # Get the transform of the ILS, using the stored one if possible
+        if ils is not self._ils_fft_src or len(self._ils_fft) != nfft//2 + 1:
+            self._ils_fft = rfft(ils, nfft)
+            self._ils_fft_src = ils
+
+        # Columns of a 2D spectrum array are each convolved
+        ils_fft = self._ils_fft.reshape((-1,) + (1,) * (np.ndim(spec) - 1))
+        conv = irfft(rfft(spec, nfft, axis=0) * ils_fft, nfft, axis=0)
+
+        # Cut out the central part, matching the 'same' mode of np.convolve
+        start = (min(len(spec), len(ils)) - 1) // 2
+        return conv[start:start+max(len(spec), len(ils))]
+
 
 # =============================================================================
 # =============================================================================
@@ -683,8 +981,10 @@ class FitResult():
             elif resid_type == 'Percentage':
                 self.resid = (self.spec - self.fit)/self.spec * 100
 
-            # Check the fit quality
-            if resid_limit is not None and max(abs(self.resid)) > resid_limit:
+            # Check the fit quality, using numpy rather than the builtin max
+            # which steps through the residual in Python
+            if (resid_limit is not None
+                    and np.nanmax(np.abs(self.resid)) > resid_limit):
                 logger.debug('High residual detected')
                 self.nerr = 2
 
@@ -692,12 +992,12 @@ class FitResult():
             if int_limit is not None:
 
                 # Check for low intensity
-                if min(self.spec) <= int_limit[0]:
+                if self.int_lo <= int_limit[0]:
                     logger.debug('Low intensity detected')
                     self.nerr = 2
 
                 # Check for high intensity
-                elif max(self.spec) >= int_limit[1]:
+                elif self.int_hi >= int_limit[1]:
                     logger.debug('High intensity detected')
                     self.nerr = 2
 
@@ -750,50 +1050,162 @@ class FitResult():
 
         # Calculate the fit without the parameter
         fit_params = params.popt_list()
-        p = self.params.popt_dict()
-
         fit = self.fwd_model(self.grid, *fit_params)
 
-        # Calculate the shifted model grid
-        shift_coefs = [p[n] for n in p if 'shift' in n]
-        zero_grid = analyser.model_grid - min(analyser.model_grid)
-        wl_shift = np.polyval(shift_coefs, zero_grid)
-        shift_model_grid = np.add(analyser.model_grid, wl_shift)
+        # Gather all the fitted parameter values in the analyser's order, as
+        #  in the forward model, to select the terms needed below
+        values = analyser._p_values.copy()
+        values[analyser._vary_idx] = self.popt
+
+        # The shift is unchanged, so take the shifted model grid from the
+        #  forward model call above. This is only valid until the next call
+        shift_model_grid = analyser._model_terms['shift_model_grid']
 
-        # Calculate the wavelength offset
-        offset_coefs = [p[n] for n in p if 'offset' in n]
-        offset = np.polyval(offset_coefs, analyser.model_grid)
-        offset = griddata(shift_model_grid,
-                          offset,
-                          self.grid,
-                          method='cubic')
+        # Calculate the wavelength offset. This was set to zero in the forward
+        #  model, so use the fitted coefficients here
+        offset_coefs = values[analyser._offset_idx]
+        offset = np.dot(analyser._offset_vander, offset_coefs)
+        offset = interp_model(shift_model_grid, offset, self.grid, 'cubic')
 
         # Calculate the parameter od
-        par_od = np.multiply(analyser.xsecs[par_name], p[par_name])
+        par_od = np.multiply(analyser.xsecs[par_name],
+                             self.params[par_name].fit_val)
 
-        # Make the ILS
+        # Make the ILS. The parameters match the forward model call above, so
+        #  the analyser returns the ILS it has just made
         if analyser.generate_ils:
-
-            ils_params = []
-            for name in ['fwem', 'k', 'a_w', 'a_k']:
-                if params[name].vary:
-                    ils_params.append(params[name].fit_val)
-                else:
-                    ils_params.append(params[name].value)
-
-            # Unpack ILS params
-            ils = make_ils(analyser.model_spacing, *ils_params)
+            ils = analyser._generate_ils(values[analyser._ils_idx])
         else:
             ils = analyser.ils
 
         # Convolve with the ILS and interpolate onto the measurement grid
-        par_od = griddata(shift_model_grid,
-                          np.convolve(par_od, ils, mode='same'),
-                          self.grid,
-                          method='cubic')
+        par_od = interp_model(shift_model_grid,
+                              analyser._convolve_ils(par_od, ils),
+                              self.grid,
+                              'cubic')
 
         # Add to self
         self.meas_od[par_name] = -np.log(np.divide(self.spec-offset, fit))
         self.synth_od[par_name] = par_od
 
         return self.meas_od[par_name], self.synth_od[par_name]
+
+
+# =============================================================================
+# Interpolate reference spectra
+# =============================================================================
+
+def interp_reference(x, y, grid):
+    """Interpolate a reference spectrum onto the model grid.
+
+    Uses a cubic spline, which matches the 1D cubic griddata interpolation
+    but without the extra sorting and setup. Points outside the reference
+    are set to NaN.
+
+    Parameters
+    ----------
+    x, y : numpy array
+        The reference spectrum wavelengths and values
+    grid : numpy array
+        The wavelength grid to interpolate onto
+
+    Returns
+    -------
+    numpy array
+        The reference spectrum on the new grid
+    """
+    return interp_model(x, y, grid, 'cubic')
+
+
+def interp_model(x, y, grid, method='cubic'):
+    """Interpolate a spectrum onto a new wavelength grid.
+
+    This gives the same result as scipy.interpolate.griddata for 1D data,
+    but uses np.interp or a cubic spline directly to avoid its overhead.
+    Points outside the spectrum are set to NaN. As with griddata, a
+    spectrum containing non-finite values gives NaN rather than an error.
+
+    Parameters
+    ----------
+    x : numpy array
+        The spectrum wavelengths
+    y : numpy array
+        The spectrum values. If 2D then each column is interpolated
+    grid : numpy array
+        The wavelength grid to interpolate onto
+    method : str, optional
+        The interpolation method, either "cubic", "linear" or "nearest".
+        The default is "cubic"
+
+    Returns
+    -------
+    numpy array
+        The spectrum on the new grid
+    """
+    # The fast routes need strictly increasing wavelengths, otherwise fall
+    #  back to griddata which handles unsorted points
+    if method in ['cubic', 'linear'] and np.all(np.diff(x) > 0):
+
+        # Build the same not-a-knot spline as griddata, without checking
+        #  for non-finite values so that these propagate as NaN
+        if method == 'cubic':
+            spline = make_interp_spline(x, y, k=3, check_finite=False)
+            return spline(grid, extrapolate=False)
+
+        if np.ndim(y) == 1:
+            return np.interp(grid, x, y, left=np.nan, right=np.nan)
+
+    return griddata(x, y, grid, method=method)
+
+
+def load_reference(fpath, grid, cache_dir=None):
+    """Read a reference spectrum file and interpolate it onto a grid.
+
+    If a cache folder is given, the interpolated spectrum is saved there and
+    loaded directly next time. The cache file is named from the file path,
+    its modification time and size, and the grid, so changing any of these
+    makes a new one.
+
+    Parameters
+    ----------
+    fpath : str
+        Path to the reference file, with columns of wavelength and value
+    grid : numpy array
+        The wavelength grid to interpolate onto
+    cache_dir : str, optional
+        Folder to hold the cached spectra. The default is None, which turns
+        off the cache
+
+    Returns
+    -------
+    numpy array
+        The reference spectrum on the grid
+    """
+    # Try the cache first
+    if cache_dir is not None:
+        fstat = os.stat(fpath)
+        key = hashlib.sha1(
+            f'{os.path.abspath(fpath)}:{fstat.st_mtime_ns}:{fstat.st_size}'
+            .encode() + np.asarray(grid, dtype=float).tobytes()
+        ).hexdigest()[:16]
+        cache_fname = os.path.join(cache_dir, f'reference_{key}.npz')
+
+        try:
+            with np.load(cache_fname) as cache:
+                return cache['spectrum']
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            pass
+
+    # Read in the file and interpolate onto the grid
+    x, y = np.loadtxt(fpath, unpack=True)
+    spectrum = interp_reference(x, y, grid)
+
+    # Save to the cache
+    if cache_dir is not None:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.savez(cache_fname, spectrum=spectrum)
+        except OSError:
+            logger.warning(f'Unable to cache {fpath} in {cache_dir}')
+
+    return spectrum
@@ -43,6 +43,9 @@ class Spectrometer():
         The serial number of the spectrometer
     pixels : int
         The number of pixels in the sensor
+    wavelengths : numpy array
+        The wavelength calibration of the spectrometer, read once on
+        connection
     integration_time : int
         The integration time of the spectrometer in ms
     coadds : int
@@ -64,6 +67,10 @@ class Spectrometer():
             self.serial_number = self.spectro.serial_number
             self.pixels = self.spectro.pixels
 
+            # The wavelength calibration is fixed, so read it once here
+            #  rather than for every spectrum
+            self.wavelengths = self.spectro.wavelengths()
+
             logger.info(f'Spectrometer {self.serial_number} connected')
 
             # Set the initial integration time and coadds
@@ -106,16 +113,16 @@ class Spectrometer():
             Contains the metadata for the spectrum
         """
         # Get the wavelengths
-        x = self.spectro.wavelengths()
+        x = self.wavelengths
 
-        # Create an empty array to hold the spectra data
-        y_arr = np.zeros([self.coadds, len(x)])
+        # Sum the coadded spectra in place, then average
+        y = np.zeros(len(x))
 
         for n in range(self.coadds):
-            y_arr[n] = self.spectro.intensities(self.correct_dark_counts,
-                                                self.correct_nonlinearity)
+            y += self.spectro.intensities(self.correct_dark_counts,
+                                          self.correct_nonlinearity)
 
-        y = np.average(y_arr, axis=0)
+        y /= self.coadds
 
         # Get the spectrum read time
         spec_time = datetime.now()
@@ -176,6 +183,7 @@ class VSpectrometer():
         self.correct_nonlinearity = correct_nonlinearity
 
         self.fpath = ''
+        self._file_spectrum = None
 
     def update_integration_time(self, integration_time):
         """Update the spectrometer integrations time (ms)."""
@@ -193,12 +201,15 @@ class VSpectrometer():
         t = self.coadds * self.integration_time / 1000
         time.sleep(t)
 
-        # Get the wavelengths
-        x, y = np.loadtxt(self.fpath, unpack=True)
+        # Get the wavelengths, only reading the file again if it changes
+        if self._file_spectrum is None or self._file_spectrum[0] != self.fpath:
+            self._file_spectrum = (self.fpath,
+                                   np.loadtxt(self.fpath, unpack=True))
+        x, y = self._file_spectrum[1]
 
         # Add a little noise for fun
         noise = np.random.normal(0, 500, y.shape)
-        y += noise
+        y = y + noise
 
         # Get the spectrum read time
         spec_time = datetime.now()
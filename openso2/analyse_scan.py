@@ -5,6 +5,7 @@ import logging
 import numpy as np
 import xarray as xr
 from datetime import datetime
+from functools import lru_cache
 
 
 logger = logging.getLogger(__name__)
@@ -33,16 +34,23 @@ def analyse_scan(scan_fname, analyser, save_fname=None):
     results : Pandas DataFrame
         Contains the scan information and fit results and errors
     """
-    # Read in the scan file
-    scan_da = xr.open_dataarray(scan_fname)
+    # Read in the scan file, loading everything needed so it is closed
+    #  before the analysis starts
+    with xr.open_dataarray(scan_fname) as scan_da:
 
-    # Pull out the wavelength information and number of spectra
-    wl_calib = scan_da.coords['wavelength'].to_numpy()
-    nspec = scan_da.attrs['specs_per_scan']
+        # Pull out the wavelength information and number of spectra
+        wl_calib = scan_da.coords['wavelength'].to_numpy()
+        nspec = scan_da.attrs['specs_per_scan']
+        scan_attrs = dict(scan_da.attrs)
+        angles = scan_da.coords['angle'][1:].load()
 
-    # Pull out the spectra and correct for the dark spectrum
-    raw_spectra = scan_da.to_numpy()
-    spectra = raw_spectra[1:] - raw_spectra[0]
+        # Pull out the spectra
+        raw_spectra = scan_da.to_numpy().astype(float, copy=False)
+
+    # Correct for the dark spectrum in place, to avoid allocating a second
+    #  copy of the scan
+    spectra = raw_spectra[1:]
+    spectra -= raw_spectra[0]
 
     # Set up the output data arrays
     output_data = {
@@ -52,9 +60,11 @@ def analyse_scan(scan_fname, analyser, save_fname=None):
         'int_hi': np.zeros(nspec, dtype=int),
         'max_resid': np.zeros(nspec)
     }
-    for par in analyser.params:
-        output_data[par] = np.zeros(nspec)
-        output_data[f'{par}_err'] = np.zeros(nspec)
+
+    # Hold the parameter results in single blocks, filled a row at a time
+    par_names = list(analyser.params)
+    fit_vals = np.zeros([nspec, len(par_names)])
+    fit_errs = np.zeros([nspec, len(par_names)])
 
     for i, spec in enumerate(spectra):
 
@@ -63,7 +73,8 @@ def analyse_scan(scan_fname, analyser, save_fname=None):
                                         update_params=True,
                                         resid_limit=20,
                                         int_limit=[0, 60000],
-                                        interp_method='linear')
+                                        interp_method='linear',
+                                        analytic_jac=True)
 
             output_data['fit_quality'][i] = fit.nerr
             output_data['int_lo'][i] = fit.int_lo
@@ -71,20 +82,23 @@ def analyse_scan(scan_fname, analyser, save_fname=None):
             output_data['int_hi'][i] = fit.int_hi
             output_data['max_resid'][i] = np.nanmax(fit.resid)
 
-            for par in fit.params.values():
-                output_data[par.name][i] = par.fit_val
-                output_data[par.name + '_err'][i] = par.fit_err
+            fit_vals[i] = [par.fit_val for par in fit.params.values()]
+            fit_errs[i] = [par.fit_err for par in fit.params.values()]
 
         except ValueError as msg:
             logger.warning(f'Error in analysis, skipping\n{msg}')
 
-        head, tail = os.path.split(scan_fname)
+    logger.info('Analysis finished for scan '
+                f'{os.path.basename(scan_fname)}')
 
-    logger.info(f'Analysis finished for scan {tail}')
+    # Split the parameter results into their output arrays
+    for n, par in enumerate(par_names):
+        output_data[par] = fit_vals[:, n]
+        output_data[f'{par}_err'] = fit_errs[:, n]
 
     # Form output dataarrays
     data_vars = {}
-    coords = {'angle': scan_da.coords['angle'][1:]}
+    coords = {'angle': angles}
     for key, value in output_data.items():
         data_vars[key] = xr.DataArray(
             data=value,
@@ -93,7 +107,7 @@ def analyse_scan(scan_fname, analyser, save_fname=None):
 
     # Form output dataset
     attrs = {
-        **scan_da.attrs,
+        **scan_attrs,
         **{'analysis_time': datetime.now().strftime('%Y-%m-%dT%H:%M:%S')}
     }
     output_ds = xr.Dataset(
@@ -109,6 +123,46 @@ def analyse_scan(scan_fname, analyser, save_fname=None):
     return output_ds
 
 
+# =============================================================================
+# Read Scan SO2
+# =============================================================================
+
+def read_scan_so2(scan_fname):
+    """Read the SO2 results from an analysed scan file.
+
+    Parameters
+    ----------
+    scan_fname : str
+        File path to the analysed scan
+
+    Returns
+    -------
+    angle : numpy array
+        The scan angle of each spectrum (degrees)
+    so2 : numpy array
+        The fitted SO2 slant column density of each spectrum
+    int_av : numpy array
+        The average intensity of each spectrum in the fit window
+    scan_time : numpy array
+        The UNIX timestamp of each spectrum (s)
+    """
+    # Only pull out the required variables, leaving the rest on disk
+    with xr.open_dataset(scan_fname) as scan_ds:
+        angle = scan_ds.coords['angle'].to_numpy()
+        so2 = scan_ds['SO2'].to_numpy()
+        int_av = scan_ds['int_av'].to_numpy()
+        start_time = np.datetime64(scan_ds.attrs['scan_start_time'], 's')
+        end_time = np.datetime64(scan_ds.attrs['scan_end_time'], 's')
+        nspec = scan_ds.attrs['specs_per_scan']
+
+    # Spread the spectra evenly across the scan duration
+    scan_time = np.floor(np.linspace(start_time.astype(float),
+                                     end_time.astype(float),
+                                     nspec))
+
+    return angle, so2, int_av, scan_time
+
+
 # =============================================================================
 # Update Integration Time
 # =============================================================================
@@ -132,11 +186,10 @@ def update_int_time(scan_fname, integration_time, settings):
     new_int_time : int
         New integration time for the next scan
     """
-    # Load the previous scan
-    spectra = xr.open_dataarray(scan_fname).to_numpy()
-
-    # Find the maximum intensity
-    max_int = np.max(spectra)
+    # Find the maximum intensity of the previous scan, closing the file
+    #  afterwards
+    with xr.open_dataarray(scan_fname) as scan_da:
+        max_int = scan_da.max().item()
 
     # Scale the intensity to the target
     scale = settings['target_int'] / max_int
@@ -145,14 +198,27 @@ def update_int_time(scan_fname, integration_time, settings):
     int_time = integration_time * scale
 
     # Find the nearest integration time
-    int_times = np.arange(settings['min_int_time'],
-                          settings['max_int_time'] + settings['int_time_step'],
-                          settings['int_time_step'])
-
-    # Find the nearest value
-    diff = ((int_times - int_time)**2)**0.5
-    idx = np.where(diff == min(diff))[0][0]
+    int_times = _int_time_grid(settings['min_int_time'],
+                               settings['max_int_time'],
+                               settings['int_time_step'])
+
+    # The grid is evenly spaced, so the nearest time is found directly from
+    #  the number of steps, rounding half steps down to the shorter time.
+    #  Times off either end of the grid (or NaN) are clipped to the ends
+    nsteps = np.ceil((int_time - settings['min_int_time'])
+                     / settings['int_time_step'] - 0.5)
+    last_idx = len(int_times) - 1
+    idx = int(np.clip(np.nan_to_num(nsteps, nan=last_idx), 0, last_idx))
     new_int_time = int(int_times[idx])
 
     # Return the updated integration time
     return new_int_time
+
+
+@lru_cache(maxsize=8)
+def _int_time_grid(min_int_time, max_int_time, int_time_step):
+    """Generate the allowed integration times, reused between scans."""
+    int_times = np.arange(min_int_time, max_int_time + int_time_step,
+                          int_time_step)
+    int_times.flags.writeable = False
+    return int_times
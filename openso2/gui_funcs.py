@@ -2,15 +2,16 @@
 
 import os
 import sys
+import time
 import logging
 import traceback
 import numpy as np
 import xarray as xr
 import pandas as pd
-from scipy.signal import savgol_filter
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtGui import QFont
-from PyQt5.QtCore import Qt, QObject, pyqtSignal
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
 from PyQt5.QtWidgets import (QComboBox, QTextEdit, QLineEdit, QDoubleSpinBox,
                              QSpinBox, QCheckBox, QDateTimeEdit, QDateEdit,
                              QPlainTextEdit, QFileDialog)
@@ -21,28 +22,83 @@ from openso2.plume import calc_plume_altitude, calc_scan_flux
 logger = logging.getLogger(__name__)
 
 
+# =============================================================================
+# Log formatter
+# =============================================================================
+
+class LogFormatter(logging.Formatter):
+    """Log formatter that reuses the timestamp string within each second."""
+
+    def __init__(self, fmt=None, datefmt=None):
+        """Initialise."""
+        super().__init__(fmt, datefmt)
+        self._time_cache = (None, None)
+
+    def formatTime(self, record, datefmt=None):
+        """Format the record time, only calling strftime once per second."""
+        second = int(record.created)
+        cached_second, time_str = self._time_cache
+        if second != cached_second:
+            time_str = time.strftime(datefmt or self.default_time_format,
+                                     self.converter(second))
+            self._time_cache = (second, time_str)
+
+        if datefmt:
+            return time_str
+        return self.default_msec_format % (time_str, record.msecs)
+
+
 # =============================================================================
 # Logging text box
 # =============================================================================
 
 class QTextEditLogger(logging.Handler, QObject):
-    """Record logs to the GUI."""
+    """Record logs to the GUI.
+
+    Log records are buffered and written to the text box in a single
+    append, flush_interval milliseconds after the first buffered record.
+    """
 
-    appendPlainText = pyqtSignal(str)
+    flushRequested = pyqtSignal()
 
-    def __init__(self, parent):
+    def __init__(self, parent, flush_interval=100):
         """Initialise."""
         super().__init__()
         QObject.__init__(self)
         self.widget = QPlainTextEdit(parent)
         self.widget.setReadOnly(True)
         self.widget.setFont(QFont('Courier', 10))
-        self.appendPlainText.connect(self.widget.appendPlainText)
+
+        # Create the buffer to hold the log records
+        self._buffer = []
+
+        # Create a timer to flush the buffer to the text box. This only
+        #  runs when there are records waiting
+        self._flush_timer = QTimer(self.widget)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(flush_interval)
+        self._flush_timer.timeout.connect(self._flush_buffer)
+        self.flushRequested.connect(self._flush_timer.start)
 
     def emit(self, record):
         """Emit the log."""
-        msg = self.format(record)
-        self.appendPlainText.emit(msg)
+        # The handler lock is held while this is called
+        self._buffer.append(self.format(record))
+
+        # Schedule a flush if one is not already pending
+        if len(self._buffer) == 1:
+            self.flushRequested.emit()
+
+    def _flush_buffer(self):
+        """Write the buffered log records to the text box."""
+        self.acquire()
+        try:
+            msgs, self._buffer = self._buffer, []
+        finally:
+            self.release()
+
+        if msgs:
+            self.widget.appendPlainText('\n'.join(msgs))
 
 
 # =============================================================================
@@ -59,13 +115,34 @@ class SyncWorker(QObject):
     updateStationStatus = pyqtSignal(str, str, str)
     updateGuiStatus = pyqtSignal(str)
     updatePlots = pyqtSignal(str, str)
-    updateFluxPlot = pyqtSignal(str)
+    updateFluxPlot = pyqtSignal(str, dict)
 
-    def __init__(self, res_dir, stations, analysis_date, sync_mode, volc_loc,
-                 default_alt, default_az, wind_speed, scan_pair_time,
-                 scan_pair_flag, min_scd, max_scd, min_int, max_int):
+    def __init__(self, max_workers=4):
         """Initialize."""
         super(QObject, self).__init__()
+
+        # Create a pool to sync the stations in parallel, kept between cycles
+        self.pool = ThreadPoolExecutor(max_workers=max_workers,
+                                       thread_name_prefix='StationSync')
+
+        # Keep track of the local folders already created
+        self._made_dirs = set()
+
+    def _make_dir(self, path):
+        """Create a local folder, skipping the check once it exists."""
+        if path not in self._made_dirs:
+            os.makedirs(path, exist_ok=True)
+            self._made_dirs.add(path)
+
+    def shutdown(self):
+        """Stop the station sync pool."""
+        self.pool.shutdown(wait=True)
+
+    def set_settings(self, res_dir, stations, analysis_date, sync_mode,
+                     volc_loc, default_alt, default_az, wind_speed,
+                     scan_pair_time, scan_pair_flag, min_scd, max_scd,
+                     min_int, max_int):
+        """Set the settings for the next sync cycle."""
         self.res_dir = res_dir
         self.stations = stations
         self.analysis_date = analysis_date
@@ -99,78 +176,18 @@ class SyncWorker(QObject):
         # Set the file path to the results folder
         fpath = f'{self.res_dir}/{self.analysis_date}'
 
-        # Sync each station
-        for station in self.stations.values():
-
-            if not station.sync_flag:
-                logging.info(f'Syncing {station.name} station disabled')
-                continue
-
-            logging.info(f'Syncing {station.name} station...')
-
-            stat_dir = f'{self.res_dir}/{self.analysis_date}/{station.name}/'
-            if not os.path.isdir(stat_dir):
-                os.makedirs(stat_dir)
-
-            # Sync the station status and log
-            time, status, err = station.pull_status()
-
-            # Update the station status
-            self.updateStationStatus.emit(station.name, time, status)
-
-            # If the connection fails, skip
-            if err[0]:
-                logger.info(f'Connection to {station.name} failed')
-                continue
+        # Sync the stations in parallel, waiting for them all to finish
+        futures = [self.pool.submit(self._sync_station, station, fpath, scans)
+                   for station in self.stations.values()]
+        for future in futures:
+            future.result()
 
-            # Pull the station logs
-            fname, err = station.pull_log(local_dir=self.res_dir)
-
-            # Read the log file
-            if fname is not None:
-                with open(fname, 'r') as r:
-                    log_text = r.readlines()
-
-                # Send signal with log text
-                self.updateLog.emit(station.name, log_text)
-
-            # Sync spectra files
-            if self.sync_mode in ['spec', 'both']:
-                local_dir = f'{self.res_dir}/{self.analysis_date}/' \
-                            + f'{station.name}/spectra/'
-                if not os.path.isdir(local_dir):
-                    os.makedirs(local_dir)
-                remote_dir = '/home/pi/OpenSO2/Results/' \
-                             + f'{self.analysis_date}/spectra/'
-                new_spec_fnames, err = station.sync(local_dir, remote_dir)
-                logging.info(f'Synced {len(new_spec_fnames)} spectra scans '
-                             + f'from {station.name}')
-
-            # Sync so2 files
-            if self.sync_mode in ['so2', 'both']:
-                local_dir = f'{self.res_dir}/{self.analysis_date}/' \
-                            + f'{station.name}/so2/'
-                if not os.path.isdir(local_dir):
-                    os.makedirs(local_dir)
-                remote_dir = '/home/pi/OpenSO2/Results/' \
-                             + f'{self.analysis_date}/so2/'
-                new_so2_fnames, err = station.sync(local_dir, remote_dir)
-                logging.info(f'Synced {len(new_so2_fnames)} scans from '
-                             + f'{station.name}')
-
-                # Add the scans to the dictionary
-                scans[station.name] = new_so2_fnames
-
-                # Update scan plots if new data is found
-                self.updatePlots.emit(station.name, fpath)
-
-        # Get all local files to recalculate flux with updated scans
-        all_scans, scan_times = get_local_scans(self.stations, fpath)
+        # Calculate the fluxes if there are any new so2 scans
+        if any(len(s) != 0 for s in scans.values()):
 
-        nscans = np.array([len(s) for s in scans.values()])
+            # Get all local files to recalculate flux with updated scans
+            all_scans, scan_times = get_local_scans(self.stations, fpath)
 
-        # Calculate the fluxes if there are any new so2 scans
-        if nscans.any():
             self.updateGuiStatus.emit('Calculating fluxes')
             flux_results = calculate_fluxes(
                 self.stations, all_scans, fpath, self.volc_loc,
@@ -186,11 +203,89 @@ class SyncWorker(QObject):
                 except FileNotFoundError:
                     pass
 
-            # Plot the fluxes on the GUI
-            self.updateFluxPlot.emit('RealTime')
+            # Plot the fluxes on the GUI, passing the results in memory
+            self.updateFluxPlot.emit('RealTime', flux_results)
 
         self.updateGuiStatus.emit('Ready')
 
+    def _sync_station(self, station, fpath, scans):
+        """Sync a single station over one connection."""
+        if not station.sync_flag:
+            logging.info(f'Syncing {station.name} station disabled')
+            return
+
+        logging.info(f'Syncing {station.name} station...')
+
+        self._make_dir(f'{self.res_dir}/{self.analysis_date}/{station.name}/')
+
+        # Open a single connection to use for the whole sync cycle
+        sftp = station.connect()
+
+        # If the connection fails, skip
+        if sftp is None:
+            self.updateStationStatus.emit(station.name, '-', 'N/C')
+            logger.info(f'Connection to {station.name} failed')
+            return
+
+        with sftp:
+            self._sync_station_files(station, sftp, fpath, scans)
+
+    def _sync_station_files(self, station, sftp, fpath, scans):
+        """Sync the status, log and scans from a single station."""
+        # Sync the station status and log
+        time, status, err = station.pull_status(sftp)
+
+        # Update the station status
+        self.updateStationStatus.emit(station.name, time, status)
+
+        # If the connection fails, skip
+        if err[0]:
+            logger.info(f'Connection to {station.name} failed')
+            return
+
+        # Pull the station logs
+        fname, err = station.pull_log(local_dir=self.res_dir,
+                                       sftp=sftp)
+
+        # Read the log file
+        if fname is not None:
+            with open(fname, 'r') as r:
+                log_text = r.readlines()
+
+            # Send signal with log text
+            self.updateLog.emit(station.name, log_text)
+
+        # Sync spectra files
+        if self.sync_mode in ['spec', 'both']:
+            local_dir = f'{self.res_dir}/{self.analysis_date}/' \
+                        + f'{station.name}/spectra/'
+            self._make_dir(local_dir)
+            remote_dir = '/home/pi/OpenSO2/Results/' \
+                         + f'{self.analysis_date}/spectra/'
+            new_spec_fnames, err = station.sync(local_dir, remote_dir,
+                                                sftp)
+            logging.info(f'Synced {len(new_spec_fnames)} spectra scans '
+                         + f'from {station.name}')
+
+        # Sync so2 files
+        if self.sync_mode in ['so2', 'both']:
+            local_dir = f'{self.res_dir}/{self.analysis_date}/' \
+                        + f'{station.name}/so2/'
+            self._make_dir(local_dir)
+            remote_dir = '/home/pi/OpenSO2/Results/' \
+                         + f'{self.analysis_date}/so2/'
+            new_so2_fnames, err = station.sync(local_dir, remote_dir,
+                                                sftp)
+            logging.info(f'Synced {len(new_so2_fnames)} scans from '
+                         + f'{station.name}')
+
+            # Add the scans to the dictionary
+            scans[station.name] = new_so2_fnames
+
+            # Update scan plots if new data is found
+            if len(new_so2_fnames) != 0:
+                self.updatePlots.emit(station.name, fpath)
+
 
 # =============================================================================
 # Post Analysis Worker
@@ -203,7 +298,7 @@ class PostAnalysisWorker(QObject):
     error = pyqtSignal(tuple)
     finished = pyqtSignal()
     updateGuiStatus = pyqtSignal(str)
-    updateFluxPlot = pyqtSignal(str)
+    updateFluxPlot = pyqtSignal(str, dict)
     updatePlots = pyqtSignal(str, str)
 
     def __init__(self, stations, resfpath, date_to_analyse, volc_loc,
@@ -265,8 +360,8 @@ class PostAnalysisWorker(QObject):
             except FileNotFoundError:
                 pass
 
-        # Plot the fluxes on the GUI
-        self.updateFluxPlot.emit('Post')
+        # Plot the fluxes on the GUI, passing the results in memory
+        self.updateFluxPlot.emit('Post', flux_results)
 
         self.updateGuiStatus.emit('Ready')
 
@@ -291,28 +386,28 @@ def calculate_fluxes(stations, scans, fpath, vent_loc, default_alt, default_az,
             'Time [UTC]', 'Scan File', 'Pair Station', 'Pair File',
             'Flux [kg/s]', 'Flux Err [kg/s]', 'Plume Altitude [m]',
             'Plume Direction [deg]', 'Wind Speed [m/s]']
-        flux_df = pd.DataFrame(index=np.arange(len(scans[name])), columns=cols)
 
-        for i, scan_fname in enumerate(scans[name]):
+        # Collect the result rows to build the dataframe in one go
+        rows = []
 
-            # Read in the scan
-            with xr.open_dataset(scan_fname) as scan_da:
+        for scan_fname in scans[name]:
 
-                # Filter the scan
-                msk_scan_da, peak, msg = filter_scan(
-                    scan_da, min_scd, max_scd, min_int, max_int, plume_scd,
-                    good_scan_lim, sg_window, sg_polyn
-                )
+            # Read in and filter the scan
+            msk_scan_da, peak, msg = filter_scan(
+                _load_scan(scan_fname), min_scd, max_scd, min_int, max_int,
+                plume_scd, good_scan_lim, sg_window, sg_polyn
+            )
 
             # Pull the scan time from the filename
-            scan_time = datetime.strptime(os.path.split(scan_fname)[1][:14],
-                                          '%Y%m%d_%H%M%S')
+            scan_time = _fname_time(os.path.split(scan_fname)[1])
 
+            # Leave the numeric columns as NaN, so they stay float even if
+            #  every scan is rejected
             if msk_scan_da is None:
                 logger.info(f'Scan {scan_fname} not analysed. {msg}')
                 row = [scan_time, os.path.split(scan_fname)[1], None, None,
-                       None, None, None, None, None]
-                flux_df.iloc[i] = row
+                       np.nan, np.nan, np.nan, np.nan, np.nan]
+                rows.append(row)
                 continue
 
             if scan_pair_flag:
@@ -335,13 +430,11 @@ def calculate_fluxes(stations, scans, fpath, vent_loc, default_alt, default_az,
                 delta_time = timedelta(minutes=scan_pair_time)
                 if time_diff < delta_time and scan_pair_flag:
 
-                    # Read in the scan
-                    alt_scan_df = pd.read_csv(near_fname)
-
-                    # Filter the scan
+                    # Read in and filter the scan
                     alt_msk_da, alt_peak, msg = filter_scan(
-                        alt_scan_df, min_scd, max_scd, min_int, max_int,
-                        plume_scd, good_scan_lim, sg_window, sg_polyn
+                        _load_scan(near_fname), min_scd, max_scd, min_int,
+                        max_int, plume_scd, good_scan_lim, sg_window,
+                        sg_polyn
                     )
 
                     # If the alt scan is good, calculate the plume altitude
@@ -384,49 +477,50 @@ def calculate_fluxes(stations, scans, fpath, vent_loc, default_alt, default_az,
             row = [scan_time, os.path.split(scan_fname)[1], alt_station_name,
                    os.path.split(near_fname)[1], flux_amt, flux_err, plume_alt,
                    plume_az, wind_speed]
-            flux_df.iloc[i] = row
+            rows.append(row)
 
-        flux_results[name] = flux_df
+        flux_results[name] = pd.DataFrame(rows, columns=cols)
 
     return flux_results
 
 
+def _load_scan(scan_fname):
+    """Read only the scan variables needed for the flux calculation."""
+    with xr.open_dataset(scan_fname) as scan_ds:
+        return scan_ds[['SO2', 'SO2_err', 'int_av']].load()
+
+
 def filter_scan(scan_da, min_scd, max_scd, min_int, max_int, plume_scd,
                 good_scan_lim, sg_window, sg_polyn):
     """Filter scans for quality and find the centre."""
+    # Pull out the arrays once to avoid repeated DataArray indexing
+    so2 = scan_da['SO2'].data
+    int_av = scan_da['int_av'].data
+
     # Filter the points for quality
-    mask = np.row_stack([
-        scan_da['SO2'] < min_scd,
-        scan_da['SO2'] > max_scd,
-        scan_da['int_av'] < min_int,
-        scan_da['int_av'] > max_int
-    ]).any(axis=0)
-
-    if len(np.where(mask)[0]) > good_scan_lim*len(scan_da['SO2']):
+    mask = (so2 < min_scd) | (so2 > max_scd) \
+        | (int_av < min_int) | (int_av > max_int)
+
+    if np.count_nonzero(mask) > good_scan_lim*so2.size:
         return None, None, 'Not enough good spectra'
 
-    filter_idx = np.all(
-        [
-            scan_da['SO2'] > min_scd,
-            scan_da['SO2'] < max_scd,
-            scan_da['int_av'] > min_int,
-            scan_da['int_av'] < max_int
-        ],
-        axis=0
-    )
+    filter_idx = (so2 > min_scd) & (so2 < max_scd) \
+        & (int_av > min_int) & (int_av < max_int)
     scan_da['filter'] = xr.DataArray(
         data=filter_idx, coords=scan_da['SO2'].coords
     )
 
     # Count the number of 'plume' spectra
-    nplume = sum(filter_idx < plume_scd)
+    nplume = np.count_nonzero(so2[filter_idx] > plume_scd)
 
     if nplume < 10:
         return None, None, 'Not enough plume spectra'
 
-    # Determine the peak scan angle
+    # Determine the peak scan angle. Scipy is only imported here to keep it
+    #  off the GUI start-up path
+    from scipy.signal import savgol_filter
     x = scan_da['angle'].data[filter_idx]
-    y = scan_da['SO2'].data[filter_idx]
+    y = so2[filter_idx]
     so2_filtered = savgol_filter(y, sg_window, sg_polyn, mode='nearest')
     peak_angle = x[so2_filtered.argmax()]
 
@@ -457,14 +551,9 @@ def get_local_scans(stations, fpath):
     # For each station find the available scans and there timestamps
     for name in stations:
         try:
-            scan_fnames[name] = [
-                f'{fpath}/{name}/so2/{f}'
-                for f in os.listdir(f'{fpath}/{name}/so2/')
-            ]
-            scan_times[name] = [
-                datetime.strptime(f[:14], '%Y%m%d_%H%M%S')
-                for f in os.listdir(f'{fpath}/{name}/so2/')
-            ]
+            fnames = os.listdir(f'{fpath}/{name}/so2/')
+            scan_fnames[name] = [f'{fpath}/{name}/so2/{f}' for f in fnames]
+            scan_times[name] = [_fname_time(f) for f in fnames]
         except FileNotFoundError:
             scan_fnames[name] = []
             scan_times[name] = []
@@ -472,6 +561,12 @@ def get_local_scans(stations, fpath):
     return scan_fnames, scan_times
 
 
+def _fname_time(fname):
+    """Read the scan time from a file name starting with YYYYmmdd_HHMMSS."""
+    return datetime(int(fname[0:4]), int(fname[4:6]), int(fname[6:8]),
+                    int(fname[9:11]), int(fname[11:13]), int(fname[13:15]))
+
+
 def find_nearest_scan(station_name, scan_time, scan_fnames, scan_times):
     """Find nearest scan from multiple other stations.
 
@@ -568,33 +663,37 @@ class Widgets(dict):
 
     def get(self, key):
         """Get the value of a widget."""
-        if type(self[key]) == QTextEdit:
-            return self[key].toPlainText()
-        elif type(self[key]) == QLineEdit:
-            return self[key].text()
-        elif type(self[key]) == QComboBox:
-            return str(self[key].currentText())
-        elif type(self[key]) == QCheckBox:
-            return self[key].isChecked()
-        elif type(self[key]) in [QDateEdit, QDateTimeEdit]:
-            return self[key].textFromDateTime(self[key].dateTime())
-        elif type(self[key]) in [SpinBox, DSpinBox, QSpinBox, QDoubleSpinBox]:
-            return self[key].value()
+        widget = self[key]
+        widget_type = type(widget)
+        if widget_type == QTextEdit:
+            return widget.toPlainText()
+        elif widget_type == QLineEdit:
+            return widget.text()
+        elif widget_type == QComboBox:
+            return str(widget.currentText())
+        elif widget_type == QCheckBox:
+            return widget.isChecked()
+        elif widget_type in [QDateEdit, QDateTimeEdit]:
+            return widget.textFromDateTime(widget.dateTime())
+        elif widget_type in [SpinBox, DSpinBox, QSpinBox, QDoubleSpinBox]:
+            return widget.value()
 
     def set(self, key, value):
         """Set the value of a widget."""
-        if type(self[key]) in [QTextEdit, QLineEdit]:
-            self[key].setText(str(value))
-        if type(self[key]) == QComboBox:
-            index = self[key].findText(value, Qt.MatchFixedString)
+        widget = self[key]
+        widget_type = type(widget)
+        if widget_type in [QTextEdit, QLineEdit]:
+            widget.setText(str(value))
+        elif widget_type == QComboBox:
+            index = widget.findText(value, Qt.MatchFixedString)
             if index >= 0:
-                self[key].setCurrentIndex(index)
-        if type(self[key]) == QCheckBox:
-            self[key].setChecked(value)
-        if type(self[key]) in [QDateEdit, QDateTimeEdit]:
-            self[key].setDateTime(self[key].dateTimeFromText(value))
-        if type(self[key]) in [SpinBox, DSpinBox, QSpinBox, QDoubleSpinBox]:
-            self[key].setValue(value)
+                widget.setCurrentIndex(index)
+        elif widget_type == QCheckBox:
+            widget.setChecked(value)
+        elif widget_type in [QDateEdit, QDateTimeEdit]:
+            widget.setDateTime(widget.dateTimeFromText(value))
+        elif widget_type in [SpinBox, DSpinBox, QSpinBox, QDoubleSpinBox]:
+            widget.setValue(value)
 
 
 def browse(gui, widget, mode='single', filter=None):
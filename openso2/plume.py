@@ -2,6 +2,7 @@
 
 import logging
 import numpy as np
+from functools import lru_cache
 from scipy.optimize import least_squares
 from math import sin, cos, atan2, pi, asin
 
@@ -139,15 +140,16 @@ def calc_scan_flux(angles, scan_so2, station, vent_location, windspeed,
     # Convert to arc length
     dx = np.multiply(dphi, arc_radius)
 
-    # Calculate the arc so2 between each spectrum
-    arc_so2 = np.array([x*np.average([so2_amts[n], so2_amts[n+1]])
-                        for n, x in enumerate(dx)])
-    arc_err = np.array([x*np.average([so2_errs[n], so2_errs[n+1]])
-                        for n, x in enumerate(dx)])
+    # Calculate the arc so2 between each spectrum from the mean of each
+    #  neighbouring pair of measurements
+    so2_amts = np.asarray(so2_amts, dtype=float)
+    so2_errs = np.asarray(so2_errs, dtype=float)
+    arc_so2 = dx * 0.5 * (so2_amts[1:] + so2_amts[:-1])
+    arc_err = dx * 0.5 * (so2_errs[1:] + so2_errs[:-1])
 
     # Add up the total SO2 in the scan, ignoring any nans
     total_so2 = np.nansum(arc_so2)
-    total_err = np.nansum(np.power(arc_err, 2))**0.5
+    total_err = np.sqrt(np.nansum(np.square(arc_err)))
 
     # Correct for the angle between the plume azimuth and scan plane
     corr_total_so2 = np.multiply(total_so2,
@@ -207,7 +209,7 @@ def calc_plume_azimuth(station, plume_loc, vent_location, plume_altitude):
     # position. If the plume is directly overhead, just return the volcano -
     # station bearing
     if alpha == 0:
-        x, plume_azimth = haversine(vent_location, [lat, lon])
+        x, plume_azimth, mu = _station_vent_geometry(lat, lon, *vent_location)
         return np.degrees(plume_azimth)
     elif alpha > 0:
         phi = (np.radians(az) - pi/2) % (2*pi)
@@ -347,8 +349,7 @@ def calc_arc_radius(station, vent_location, plume_altitude, plume_azimuth):
     plume_phi = np.radians(plume_azimuth)
 
     # Find the distance and bearing from the volcano to the station and back
-    x, mu_p = haversine(vent_location, [lat, lon])
-    x1, mu = haversine([lat, lon], vent_location)
+    x, mu_p, mu = _station_vent_geometry(lat, lon, *vent_location)
 
     # Calculate delta, the angle between the station-volcano and plume vectors
     delta = np.abs(plume_phi - mu_p)
@@ -371,11 +372,32 @@ def calc_arc_radius(station, vent_location, plume_altitude, plume_azimuth):
     # Calcuate d, the ground distance from the scanner to the plume
     d = x * np.sin(delta) / np.sin(epsilon)
 
-    arc_radius = (d**2 + rel_plume_altitude**2)**0.5
+    arc_radius = np.hypot(d, rel_plume_altitude)
 
     return arc_radius
 
 
+@lru_cache(maxsize=32)
+def _station_vent_geometry(lat, lon, vent_lat, vent_lon):
+    """Find the distance and bearings between a station and the vent.
+
+    These only depend on the fixed station and vent locations, so they are
+    cached rather than recalculated for every scan.
+
+    Returns
+    -------
+    distance : float
+        The distance between the vent and the station in meters.
+    vent_bearing : float
+        The bearing from the vent to the station (radians).
+    station_bearing : float
+        The bearing from the station to the vent (radians).
+    """
+    distance, vent_bearing = haversine([vent_lat, vent_lon], [lat, lon])
+    x, station_bearing = haversine([lat, lon], [vent_lat, vent_lon])
+    return distance, vent_bearing, station_bearing
+
+
 # =============================================================================
 # haversine
 # =============================================================================
@@ -14,6 +14,14 @@ from gpiozero import DigitalInputDevice
 
 logger = logging.getLogger(__name__)
 
+# Stepping modes and directions for the stepper motor
+STEP_MODES = {'single':     stepper.SINGLE,
+              'double':     stepper.DOUBLE,
+              'interleave': stepper.INTERLEAVE,
+              'micro':      stepper.MICROSTEP}
+STEP_DIRECTIONS = {'forward':  stepper.FORWARD,
+                   'backward': stepper.BACKWARD}
+
 
 class Scanner:
     """Scanner class.
@@ -167,15 +175,9 @@ class Scanner:
         -------
         None
         """
-        # Set stepping mode dict
-        step_mode = {'single':     stepper.SINGLE,
-                     'double':     stepper.DOUBLE,
-                     'interleave': stepper.INTERLEAVE,
-                     'micro':      stepper.MICROSTEP}
-
-        # Set stepping direction dict
-        step_dir = {'forward':  stepper.FORWARD,
-                    'backward': stepper.BACKWARD}
+        # Look up the stepping mode and direction
+        step_mode = STEP_MODES[self.step_type]
+        step_dir = STEP_DIRECTIONS[direction]
 
         # Perform steps
         for i in range(steps):
@@ -184,8 +186,7 @@ class Scanner:
             time.sleep(0.01)
 
             # Step the motor
-            self.motor.onestep(direction=step_dir[direction],
-                               style=step_mode[self.step_type])
+            self.motor.onestep(direction=step_dir, style=step_mode)
 
         # Update the motor postion
         if direction == 'backward':
@@ -497,8 +498,9 @@ class VScanner:
         fpath : str
             File path to the saved scan
         """
-        # Create array to hold scan data
-        scan_data = np.zeros((settings['specs_per_scan'],
+        # Create array to hold scan data, with the dark spectrum in the first
+        #  row. Each row holds 8 info columns followed by the spectrum
+        scan_data = np.zeros((settings['specs_per_scan']+1,
                               self.spectrometer.pixels+8))
 
         # Return the scanner position to home
@@ -519,14 +521,14 @@ class VScanner:
         logger.info('Acquiring dark spectrum')
         self.spectrometer.fpath = 'data_bases/dark.txt'
         dark_spec, info = self.spectrometer.get_spectrum()
-        dark_data = np.array([0,  # Step number
-                              dt.hour, dt.minute, dt.second,  # Time
-                              self.position,  # Scanner position
-                              self.angle,  # Scan angle
-                              info['coadds'],  # Coadds
-                              info['integration_time']  # Integration time
-                              ])
-        scan_data[0] = np.append(dark_data, dark_spec[1])
+        scan_data[0, :8] = [0,  # Step number
+                            dt.hour, dt.minute, dt.second,  # Time
+                            self.position,  # Scanner position
+                            self.angle,  # Scan angle
+                            info['coadds'],  # Coadds
+                            info['integration_time']  # Integration time
+                            ]
+        scan_data[0, 8:] = dark_spec[1]
 
         # Move scanner to start position
         logger.info('Moving to start position')
@@ -544,14 +546,14 @@ class VScanner:
             t = info['time']
 
             # Add the data to the array
-            spec_data = np.array([step_no,  # Step number
-                                  t.hour, t.minute, t.second,  # Time
-                                  self.position,  # Scanner pos
-                                  self.angle,  # Scan angle
-                                  self.spectrometer.coadds,   # Coadds
-                                  self.spectrometer.integration_time  # I time
-                                  ])
-            scan_data[step_no] = np.append(spec_data, spectrum[1])
+            scan_data[step_no, :8] = [step_no,  # Step number
+                                      t.hour, t.minute, t.second,  # Time
+                                      self.position,  # Scanner pos
+                                      self.angle,  # Scan angle
+                                      self.spectrometer.coadds,   # Coadds
+                                      self.spectrometer.integration_time
+                                      ]
+            scan_data[step_no, 8:] = spectrum[1]
 
             # Step the scanner
             self.step(settings['steps_per_spec'])
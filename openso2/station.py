@@ -2,6 +2,7 @@
 
 import os
 import logging
+from contextlib import contextmanager
 from datetime import datetime as dt
 
 try:
@@ -38,11 +39,57 @@ class Station:
         self.sync_flag = sync_flag
         self.filter_spectra_flag = filter_spectra_flag
 
+        # Keep track of the local folders already created
+        self._made_dirs = set()
+
+    def _make_dir(self, path):
+        """Create a local folder, skipping the check once it exists."""
+        if path not in self._made_dirs:
+            os.makedirs(path, exist_ok=True)
+            self._made_dirs.add(path)
+
+# =============================================================================
+# Connect
+# =============================================================================
+
+    def connect(self):
+        """Open an SFTP connection to the station.
+
+        The connection can be passed to the sync and pull methods so that a
+        single connection is used for a full sync cycle. It should be used as
+        a context manager so it is closed afterwards.
+
+        Returns
+        -------
+        sftp : pysftp.Connection or None
+            The open connection, or None if the connection failed
+        """
+        cnopts = pysftp.CnOpts()
+        cnopts.hostkeys = None
+
+        try:
+            return pysftp.Connection(**self.com_info, cnopts=cnopts)
+        except SSHException:
+            logger.info(f'Error with station {self.name} communication',
+                        exc_info=True)
+            return None
+
+    @contextmanager
+    def _session(self, sftp=None):
+        """Use the given connection, or open a new one for a single call."""
+        if sftp is not None:
+            yield sftp
+        else:
+            cnopts = pysftp.CnOpts()
+            cnopts.hostkeys = None
+            with pysftp.Connection(**self.com_info, cnopts=cnopts) as conn:
+                yield conn
+
 # =============================================================================
 # Sync Folder
 # =============================================================================
 
-    def sync(self, local_dir, remote_dir):
+    def sync(self, local_dir, remote_dir, sftp=None):
         """Sync a local folder with a remote one.
 
         Parameters
@@ -51,21 +98,21 @@ class Station:
             File path to the local folder
         remote_dir : str
             File path to the remote folder
+        sftp : pysftp.Connection, optional
+            An open connection to the station. If None (default) then a new
+            connection is opened
 
         Returns
         -------
         new_fnames : list
             List of synced file name strings
         """
-        cnopts = pysftp.CnOpts()
-        cnopts.hostkeys = None
-
         # Create list to hold new filenames
         new_fnames = []
 
         # Open connection
         try:
-            with pysftp.Connection(**self.com_info, cnopts=cnopts) as sftp:
+            with self._session(sftp) as sftp:
 
                 # Get the file names in the local directory
                 local_files = os.listdir(local_dir)
@@ -112,16 +159,14 @@ class Station:
 #   Pull Status
 # =============================================================================
 
-    def pull_status(self):
+    def pull_status(self, sftp=None):
         """Pull the station status.
 
         Parameters
         ----------
-        com_info : dict
-            Contains the connection parameters:
-                - host: IP address of the remote server
-                - username: Username for the remote server
-                - password: Password for the remote server
+        sftp : pysftp.Connection, optional
+            An open connection to the station. If None (default) then a new
+            connection is opened
 
         Returns
         -------
@@ -129,16 +174,12 @@ class Station:
             Dictionary containing the status of the station
         """
         # Make sure the Station folder exists
-        if not os.path.exists('Station'):
-            os.makedirs('Station')
-
-        cnopts = pysftp.CnOpts()
-        cnopts.hostkeys = None
+        self._make_dir('Station')
 
         try:
 
             # Open connection
-            with pysftp.Connection(**self.com_info, cnopts=cnopts) as sftp:
+            with self._session(sftp) as sftp:
 
                 # Get the status file
                 sftp.get('/home/pi/OpenSO2/Station/status.txt',
@@ -163,7 +204,7 @@ class Station:
 #   Pull Log
 # =============================================================================
 
-    def pull_log(self, local_dir='Results', sdate=None):
+    def pull_log(self, local_dir='Results', sdate=None, sftp=None):
         """Pull the log file from the station for analysis.
 
         NOTE THIS ASSUMES THE DATE ON THE PI IS CORRECT TO PULL THE CORRECT LOG
@@ -173,6 +214,9 @@ class Station:
         ----------
         sdate : datetime.date object or None, optional
             The date to sync the log for. If None, then today is used.
+        sftp : pysftp.Connection, optional
+            An open connection to the station. If None (default) then a new
+            connection is opened
 
         Returns
         -------
@@ -187,16 +231,12 @@ class Station:
             sdate = dt.now().date()
 
         # Make sure the Station folder exists
-        if not os.path.exists(f'{local_dir}/{sdate}/{self.name}'):
-            os.makedirs(f'{local_dir}/{sdate}/{self.name}')
-
-        cnopts = pysftp.CnOpts()
-        cnopts.hostkeys = None
+        self._make_dir(f'{local_dir}/{sdate}/{self.name}')
 
         try:
 
             # Open connection
-            with pysftp.Connection(**self.com_info, cnopts=cnopts) as sftp:
+            with self._session(sftp) as sftp:
 
                 # Get the status file
                 try:
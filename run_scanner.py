@@ -20,8 +20,11 @@ import sys
 import time
 import yaml
 import logging
+from logging.handlers import MemoryHandler
 from datetime import datetime
 from multiprocessing import Process
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from ifit.gps import GPS
 from ifit.parameters import Parameters
@@ -59,12 +62,15 @@ if not os.path.exists(f'{results_fpath}/so2/'):
 if not os.path.exists(f'{results_fpath}/spectra/'):
     os.makedirs(f'{results_fpath}/spectra/')
 
-# Add a file handler o the logger
+# Add a file handler to the logger. Records are buffered and written in
+#  batches, with warnings and errors flushing the buffer immediately
 file_handler = logging.FileHandler(f'{results_fpath}/{datestamp}.log')
 log_fmt = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 file_format = logging.Formatter(log_fmt, '%Y-%m-%d %H:%M:%S')
 file_handler.setFormatter(file_format)
-logger.addHandler(file_handler)
+memory_handler = MemoryHandler(capacity=200, flushLevel=logging.WARNING,
+                               target=file_handler)
+logger.addHandler(memory_handler)
 
 
 # =============================================================================
@@ -97,6 +103,48 @@ def exception_handler(*exc_info):
 sys.excepthook = exception_handler
 
 
+# =============================================================================
+# Scan analysis
+# =============================================================================
+
+# The analyser used by each analysis worker process
+worker_analyser = None
+
+
+def init_analysis_worker(analyser):
+    """Store the analyser in the analysis worker process."""
+    global worker_analyser
+    worker_analyser = analyser
+
+
+def run_analysis(scan_fname, save_fname):
+    """Analyse a scan, writing any buffered logs once finished."""
+    # Start each scan from the configured parameters, so the results do not
+    #  depend on which scans this worker analysed before
+    worker_analyser.p0 = worker_analyser.params.fittedvalueslist()
+
+    try:
+        analyse_scan(scan_fname, worker_analyser, save_fname)
+    finally:
+        memory_handler.flush()
+
+
+def start_analysis_pool(n_workers, analyser):
+    """Start the worker processes, each with its own copy of the analyser."""
+    return ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=init_analysis_worker,
+        initargs=[analyser]
+    )
+
+
+def log_analysis_error(future):
+    """Log any error raised by a scan analysis."""
+    error = future.exception()
+    if error is not None:
+        logger.error('Error in scan analysis', exc_info=error)
+
+
 # =============================================================================
 # Begin the main program
 # =============================================================================
@@ -157,8 +205,12 @@ def main_loop():
                       f'\t{params[name].vary}\t{params[name].xpath}'
     settings['fit_parameters'] = params_str
 
-    # Generate the analyser
-    analyser = Analyser(
+    # Generate the analyser in the background, as loading the reference
+    #  spectra is slow and can overlap with waiting for the start time. It
+    #  is collected before the scanner is engaged
+    executor = ThreadPoolExecutor(max_workers=1)
+    analyser_future = executor.submit(
+        Analyser,
         params=params,
         fit_window=[310, 320],
         frs_path='Ref/sao2010.txt',
@@ -167,6 +219,7 @@ def main_loop():
         ils_type='Params',
         ils_path=f'Station/{spectro.serial_number}_ils.txt'
     )
+    executor.shutdown(wait=False)
 
     # Report fitting parameters
     logger.info(params.pretty_print(cols=['name', 'value', 'vary', 'xpath']))
@@ -178,8 +231,12 @@ def main_loop():
     start_time = datetime.strptime(settings['start_time'], '%H:%M').time()
     stop_time = datetime.strptime(settings['stop_time'], '%H:%M').time()
 
-    # Create list to hold active processes
-    processes = []
+    # Create a pool of worker processes for the scan analysis, started on
+    #  the first scan, and a list to hold the analysis jobs. One core
+    #  is left free for controlling the scanner
+    n_workers = max(1, (os.cpu_count() or 1) - 1)
+    pool = None
+    jobs = []
 
     # If before scan time, wait
     if datetime.now().time() < start_time:
@@ -191,6 +248,10 @@ def main_loop():
             logger.debug('Station on standby')
             time.sleep(10)
 
+    # Wait for the analyser to finish loading before the scanner is engaged,
+    #  so that any error in the reference or ILS files is raised here
+    analyser = analyser_future.result()
+
     # Connect to the scanner
     scanner = Scanner(
         switch_pin=settings['switch_pin'],
@@ -223,12 +284,12 @@ def main_loop():
         spectro.update_integration_time(new_int_time)
         logger.info(f'Integration time updated to {int(new_int_time)}')
 
-        # Clear any finished processes from the processes list
-        processes = [p for p in processes if p.is_alive()]
+        # Clear any finished jobs from the jobs list
+        jobs = [job for job in jobs if not job.done()]
 
-        # Check the number of processes. If there are more than two then don't
-        #  start another to prevent too many processes running at once
-        if len(processes) <= 2:
+        # Check the number of jobs. If every worker is busy then don't start
+        #  another to prevent the analysis falling behind
+        if len(jobs) < n_workers:
 
             # Log the start of the scan analysis
             _, tail = os.path.split(scan_fname)
@@ -237,17 +298,27 @@ def main_loop():
             # Build the save filename
             save_fname = f'{results_fpath}/so2/{tail[:-11]}_results.nc'
 
-            # Create new process to handle fitting of the last scan
-            p = Process(
-                target=analyse_scan,
-                args=[scan_fname, analyser, save_fname]
-            )
-
-            # Add to array of active processes
-            processes.append(p)
-
-            # Begin the process
-            p.start()
+            # Write out the buffered logs so they are not copied into the
+            #  worker processes
+            memory_handler.flush()
+
+            # Start the worker processes on the first scan. Each worker keeps
+            #  its own copy of the analyser between scans
+            if pool is None:
+                pool = start_analysis_pool(n_workers, analyser)
+
+            # Send the last scan to be analysed. If a worker has crashed the
+            #  pool is broken, so replace it and send the scan again
+            try:
+                job = pool.submit(run_analysis, scan_fname, save_fname)
+            except BrokenProcessPool:
+                logger.error('Analysis workers failed, restarting them',
+                             exc_info=True)
+                pool.shutdown(wait=False)
+                pool = start_analysis_pool(n_workers, analyser)
+                job = pool.submit(run_analysis, scan_fname, save_fname)
+            job.add_done_callback(log_analysis_error)
+            jobs.append(job)
 
         else:
             # Log that the process was not started
@@ -265,8 +336,8 @@ def main_loop():
     logger.info('Scanner released')
 
     # Finish up any analysis that is still ongoing
-    for p in processes:
-        p.join()
+    if pool is not None:
+        pool.shutdown(wait=True)
 
     # Change the station status
     log_status('Asleep')
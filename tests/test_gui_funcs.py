@@ -0,0 +1,81 @@
+"""Checks for the OpenSO2 GUI flux functions."""
+import numpy as np
+import pytest
+
+xr = pytest.importorskip('xarray')
+pytest.importorskip('pandas')
+pytest.importorskip('PyQt5')
+
+from openso2.station import Station  # noqa: E402
+from openso2.gui_funcs import calculate_fluxes, filter_scan  # noqa: E402
+
+# Scan filter settings
+FILTER_KWARGS = {
+    'min_scd': -1e17,
+    'max_scd': 1e20,
+    'min_int': 1000,
+    'max_int': 60000,
+    'plume_scd': 1e17,
+    'good_scan_lim': 0.2,
+    'sg_window': 11,
+    'sg_polyn': 3
+}
+
+
+def make_scan(nplume, nspec=50, int_av=20000):
+    """Make a scan with nplume spectra above the plume SCD."""
+    so2 = np.full(nspec, 1e16)
+    so2[20:20+nplume] = 5e17
+    return xr.Dataset(
+        data_vars={'SO2': ('angle', so2),
+                   'SO2_err': ('angle', np.full(nspec, 1e15)),
+                   'int_av': ('angle', np.full(nspec, int_av))},
+        coords={'angle': np.linspace(-80, 80, nspec)}
+    )
+
+
+def test_filter_scan_rejects_few_plume_spectra():
+    """Scans with fewer than 10 spectra above plume_scd are rejected."""
+    scan_da, peak, msg = filter_scan(make_scan(9), **FILTER_KWARGS)
+    assert scan_da is None and peak is None
+    assert msg == 'Not enough plume spectra'
+
+
+def test_filter_scan_accepts_plume():
+    """Scans with 10 spectra above plume_scd are accepted."""
+    scan_da, peak, msg = filter_scan(make_scan(10), **FILTER_KWARGS)
+    assert msg == 'Scan analysed'
+    assert scan_da['filter'].data.all()
+    assert scan_da['angle'].data[20] <= peak <= scan_da['angle'].data[29]
+
+
+def test_calculate_fluxes_all_rejected(tmp_path):
+    """Rejected scans give float NaN fluxes, even if all are rejected."""
+    so2_path = tmp_path / 'TEST' / 'so2'
+    so2_path.mkdir(parents=True)
+
+    # Make scans that are too dark to use
+    scan_fnames = []
+    for n in range(3):
+        fname = str(so2_path / f'20200101_12{n:02d}00_TEST_Scan{n:03d}.nc')
+        make_scan(20, int_av=100).to_netcdf(fname)
+        scan_fnames.append(fname)
+
+    station = Station('TEST', com_info={},
+                      loc_info={'latitude': 0, 'longitude': 0,
+                                'altitude': 0, 'azimuth': 0})
+    flux_results = calculate_fluxes(
+        {'TEST': station}, {'TEST': scan_fnames}, str(tmp_path),
+        vent_loc=[0.1, 0.1], default_alt=1000, default_az=0, wind_speed=5,
+        scan_pair_time=10, scan_pair_flag=False, **{
+            key: FILTER_KWARGS[key]
+            for key in ['min_scd', 'max_scd', 'min_int', 'max_int']
+        }
+    )
+
+    flux_df = flux_results['TEST']
+    assert len(flux_df) == 3
+    for col in ['Flux [kg/s]', 'Flux Err [kg/s]', 'Plume Altitude [m]',
+                'Plume Direction [deg]', 'Wind Speed [m/s]']:
+        assert flux_df[col].dtype == float
+        assert flux_df[col].isna().all()
@@ -0,0 +1,127 @@
+"""Regression checks for the iFit Analyser."""
+import os
+
+import numpy as np
+import pytest
+from scipy.interpolate import griddata
+
+from ifit.parameters import Parameters
+from ifit.spectral_analysis import Analyser, interp_model
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def repo_path(*parts):
+    """Return the path to a file in the repository."""
+    return os.path.join(ROOT, *parts)
+
+
+def make_analyser(**extra_params):
+    """Analyser set up as in Station/station_settings_ex.yml."""
+    params = Parameters()
+    params.add('SO2', value=1.0e16, xpath=repo_path('Ref', 'SO2_295K.txt'))
+    params.add('O3', value=1.0e19,
+               xpath=repo_path('Ref', 'O3_Voigt_246K.txt'))
+    params.add('Ring', value=0.1, xpath=repo_path('Ref', 'Ring.txt'))
+    params.add('bg_poly0', value=0.0)
+    params.add('bg_poly1', value=0.0)
+    params.add('bg_poly2', value=0.0)
+    params.add('bg_poly3', value=1.0)
+    params.add('offset0', value=0.0)
+    params.add('shift0', value=0.0)
+    params.add('shift1', value=0.1)
+    for name, value in extra_params.items():
+        params.add(name, value=value)
+
+    return Analyser(params=params,
+                    fit_window=[310, 320],
+                    frs_path=repo_path('Ref', 'sao2010.txt'),
+                    stray_flag=True,
+                    stray_window=[280, 290],
+                    ils_type='Params',
+                    ils_path=repo_path('Station', 'TEST123456_ils.txt'))
+
+
+def load_spectrum(fname):
+    """Load a bundled spectrum with the dark spectrum subtracted."""
+    _, dark = np.loadtxt(repo_path('data_bases', 'dark.txt'), unpack=True)
+    x, y = np.loadtxt(repo_path('data_bases', fname), unpack=True)
+    return [x, y - dark]
+
+
+@pytest.fixture(scope='module')
+def analyser():
+    """Analyser with the example station parameters."""
+    return make_analyser()
+
+
+@pytest.mark.parametrize('fname', ['spectrum_00320.txt',
+                                   'spectrum_00360.txt'])
+def test_analytic_jacobian_fit(analyser, fname):
+    """The analytic Jacobian fit matches the finite difference fit."""
+    spectrum = load_spectrum(fname)
+
+    fits = [analyser.fit_spectrum(spectrum, update_params=False,
+                                  analytic_jac=analytic_jac)
+            for analytic_jac in [False, True]]
+    fd_fit, jac_fit = fits
+
+    assert fd_fit.nerr == 1 and jac_fit.nerr == 1
+
+    # Both fits reach the same minimum
+    fd_ssr, jac_ssr = [np.nansum(np.square(fit.resid)) for fit in fits]
+    assert jac_ssr == pytest.approx(fd_ssr, rel=1e-4)
+
+    # The parameters agree to well within their errors, and the errors are
+    #  finite
+    assert np.all(np.isfinite(jac_fit.perr))
+    assert np.all(np.abs(jac_fit.popt - fd_fit.popt) < 0.05 * fd_fit.perr)
+    np.testing.assert_allclose(jac_fit.perr, fd_fit.perr, rtol=0.05)
+
+
+@pytest.mark.parametrize('fname', ['spectrum_00320.txt',
+                                   'spectrum_00360.txt'])
+def test_analytic_jacobian_linear_fit(analyser, fname):
+    """With the analyse_scan settings the analytic fit is at least as good.
+
+    With linear interpolation the finite difference fit can stall on the
+    shift, so the analytic fit only has to reach an SSR no higher.
+    """
+    spectrum = load_spectrum(fname)
+
+    fits = [analyser.fit_spectrum(spectrum, update_params=False,
+                                  interp_method='linear',
+                                  analytic_jac=analytic_jac)
+            for analytic_jac in [False, True]]
+    fd_ssr, jac_ssr = [np.nansum(np.square(fit.resid)) for fit in fits]
+
+    assert fits[1].nerr == 1
+    assert np.all(np.isfinite(fits[1].perr))
+    assert jac_ssr <= fd_ssr * (1 + 1e-4)
+
+    # The result agrees with the cubic finite difference fit
+    cubic_fit = analyser.fit_spectrum(spectrum, update_params=False)
+    assert np.all(np.abs(fits[1].popt - cubic_fit.popt)
+                  < 0.1 * cubic_fit.perr)
+
+
+def test_interp_model_non_finite():
+    """A non-finite spectrum gives NaN, as with griddata, not an error."""
+    x = np.linspace(310, 320, 200)
+    y = np.sin(x)
+    y[50] = np.inf
+    grid = np.linspace(309, 321, 300)
+
+    cubic = interp_model(x, y, grid, 'cubic')
+    expected = griddata(x, y, grid, method='cubic')
+    np.testing.assert_array_equal(np.isnan(cubic), np.isnan(expected))
+
+
+@pytest.mark.parametrize('fname', ['spectrum_00320.txt',
+                                   'spectrum_00360.txt'])
+def test_fit_with_ldf(fname):
+    """Fits with light dilution run even if the model becomes non-finite."""
+    fit = make_analyser(LDF=0.1).fit_spectrum(load_spectrum(fname),
+                                              update_params=False)
+    assert fit.nerr == 1
+    assert np.all(np.isfinite(fit.popt))